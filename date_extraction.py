@@ -0,0 +1,142 @@
+"""
+(c) 2022 Shoshi (Sharon) Cooper.  No duplication is permitted for commercial use.  Any significant changes made must be
+stated explicitly and the original source code, if used, must be available and credited to Shoshi (Sharon) Cooper.
+
+Pulls dates out of large collections of documents (legal text, filings...) using CheckDate.
+
+    for doc_id, start, stop, date in extract_dates({'10-K': Path('10k.txt'), 'memo': memo_text}, processes=8):
+        ...
+
+Each document is read a paragraph at a time and each paragraph goes through a single CheckDate, so memory stays the
+same however big the document is.  This also matters for speed: CheckDate's bitmasks are as long as its text, so
+one enormous CheckDate would get slower with every letter.  Paragraphs are split on blank lines, and any paragraph
+longer than max_chars is cut at a space.  A date that happens to be cut in half that way won't be found.
+
+With processes, documents are handed out to a process pool.  Only a few documents are in flight at a time, so a
+multi-GB corpus never has to be in memory at once.  Month languages added with register_month_locale and the fuzzy
+month settings are copied over to the workers, since spawned workers start from a fresh import.
+"""
+import collections
+import concurrent.futures
+import os
+from date_subclass import CheckDate
+
+
+# The CheckDate class attributes that can be changed at runtime, and so have to be sent to worker processes
+WORKER_SETTINGS = ('MONTH_LOCALES', 'FUZZY_MONTH_DISTANCE', 'FUZZY_MONTH_MIN_LENGTH')
+
+
+def _configure_worker(subclass, settings):
+    """Runs once in each worker process to give subclass the same WORKER_SETTINGS it has in the parent process"""
+    settings = dict(settings)
+    for locale, months in settings.pop('MONTH_LOCALES').items():
+        if subclass.MONTH_LOCALES.get(locale) != months:
+            subclass.register_month_locale(locale, months)
+    for name, value in settings.items():
+        setattr(subclass, name, value)
+
+
+def _iter_lines(text):
+    """Iterates over the lines of a string (keeping the '\\n') without copying the whole thing"""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start)
+        end = len(text) if end == -1 else end + 1
+        yield text[start:end]
+        start = end
+
+
+def _iter_paragraphs(lines, max_chars):
+    """Yields (offset, paragraph) for each paragraph.  offset is where the paragraph starts in the document."""
+    paragraph = []
+    length = 0
+    offset = 0
+
+    for line in lines:
+        if not line.strip():
+            if paragraph:
+                yield offset, "".join(paragraph)
+            offset += length + len(line)
+            paragraph, length = [], 0
+            continue
+
+        paragraph.append(line)
+        length += len(line)
+        # Too long: cut at the last space before max_chars (or right at max_chars if there isn't one)
+        while length > max_chars:
+            text = "".join(paragraph)
+            cut = max(text.rfind(' ', 0, max_chars), text.rfind('\n', 0, max_chars)) + 1
+            if cut <= 0:
+                cut = max_chars
+            yield offset, text[:cut]
+            offset += cut
+            paragraph = [text[cut:]]
+            length = len(paragraph[0])
+
+    if paragraph:
+        yield offset, "".join(paragraph)
+
+
+def _document_lines(source):
+    """The lines of a document, which can be a string, a path, or an open text file"""
+    if isinstance(source, str):
+        yield from _iter_lines(source)
+    elif isinstance(source, os.PathLike):
+        with open(source, encoding='utf-8') as file:
+            yield from file
+    else:
+        yield from source
+
+
+def document_dates(doc_id, source, max_chars=4096, subclass=CheckDate):
+    """Returns a list of (doc_id, start, stop, datetime.date) for every date found in one document"""
+    hits = []
+    for offset, paragraph in _iter_paragraphs(_document_lines(source), max_chars):
+        for start, stop, date in subclass(paragraph).iter_dates():
+            hits.append((doc_id, offset + start, offset + stop, date))
+    return hits
+
+
+def _iter_documents(documents):
+    """Turns a dict, an iterable of (doc_id, source) pairs, or an iterable of plain sources into (doc_id, source)"""
+    if isinstance(documents, dict):
+        documents = documents.items()
+    for i, document in enumerate(documents):
+        if isinstance(document, tuple):
+            yield document
+        else:
+            yield i, document
+
+
+def extract_dates(documents, processes=None, max_chars=4096, max_pending=None, subclass=CheckDate):
+    """
+    Yields (doc_id, start, stop, datetime.date) for every date in every document, in document order.
+    start and stop are character indices into the document.
+
+    :param documents: a dict of {doc_id: source}, an iterable of (doc_id, source) pairs, or an iterable of sources
+        (which are then numbered from 0).  A source is the text itself as a str, an os.PathLike (ex. pathlib.Path)
+        to a UTF-8 text file, or an open text file.
+    :param processes: None to do everything in this process.  Otherwise, the number of worker processes to use.
+        Open files can't be sent to other processes, so use strings or paths with this.
+    :param max_chars: the longest paragraph handed to a single CheckDate
+    :param max_pending: the most documents sent to the pool at once.  Default is twice the number of processes.
+    :param subclass: the CheckDate class to use.  With processes, it must be importable by the workers.
+    """
+    if processes is None:
+        for doc_id, source in _iter_documents(documents):
+            yield from document_dates(doc_id, source, max_chars, subclass)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * processes
+
+    settings = {name: getattr(subclass, name) for name in WORKER_SETTINGS}
+    with concurrent.futures.ProcessPoolExecutor(processes, initializer=_configure_worker,
+                                                initargs=(subclass, settings)) as pool:
+        pending = collections.deque()
+        for doc_id, source in _iter_documents(documents):
+            pending.append(pool.submit(document_dates, doc_id, source, max_chars, subclass))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -28,50 +28,265 @@ Known issues:
     - Gets confused when someone is named April or June or any other month name.
     - There are issues when there are two extended word-dates in a row.  Sometimes, chooses day/year for wrong month.
     - Requires a 4 digit year (I did that deliberately but have not decided if I am happy with that.)
+    - Day, then year, then month name ("5 2020 March", "the 5th, 2020 in March") is not a date.  Older versions said it
+      was, but only when the day was a single digit ("15 2020 March" never was), because single-digit clusters got
+      dropped when counting the numbers before the month.  Now every cluster is counted, so a year before the month
+      only goes with the day right after it ("2020, 5 March").
 """
+import array
+import bisect
 import collections
+import contextlib
 import datetime
+import itertools
+import re
 from maybe_number_superclass import *
 from trie import Trie
 
 
+class DigitClusters(object):
+    """
+    A table of the digit clusters (runs of digits) in a CheckDate, one row per cluster, in the order they appear.
+    CheckDate.append and pop keep it up to date, so nothing has to walk the bitmasks to find out where the numbers are.
+
+        starts: the index where each cluster starts
+        stops: the index just after each cluster ends, or None if the string still ends in the cluster
+        values: the number each cluster makes
+        flags: the flags for the value (see CheckDate._DATE_FLAGS)
+        years: the rows that are four-digit numbers, in order
+    """
+    __slots__ = ('starts', 'stops', 'values', 'flags', 'years', '_year_flag')
+
+    def __init__(self, year_flag):
+        self.starts = []
+        self.stops = []
+        self.values = []
+        self.flags = []
+        self.years = []
+        # The flag that marks a four-digit number
+        self._year_flag = year_flag
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, value, flags):
+        """A new cluster at the end of the string"""
+        self.starts.append(start)
+        self.stops.append(None)
+        self.values.append(value)
+        self.flags.append(0)
+        self.update(value, flags)
+
+    def update(self, value, flags):
+        """The last cluster's number changed"""
+        row = len(self.starts) - 1
+        self.values[row] = value
+        self.flags[row] = flags
+        is_year = bool(self.years) and self.years[-1] == row
+        if flags & self._year_flag and not is_year:
+            self.years.append(row)
+        elif is_year and not flags & self._year_flag:
+            self.years.pop()
+
+    def remove(self):
+        """Removes the last cluster"""
+        self.update(0, 0)
+        self.starts.pop()
+        self.stops.pop()
+        self.values.pop()
+        self.flags.pop()
+
+    def stop(self, row, length):
+        """Where the cluster ends.  length is the length of the string, for the cluster the string still ends in."""
+        stop = self.stops[row]
+        return length if stop is None else stop
+
+    def count_before(self, index):
+        """How many clusters start before index"""
+        return bisect.bisect_left(self.starts, index)
+
+    def nearest_year(self, start, stop, length):
+        """
+        The row of the four-digit number closest to the text at [start:stop], which can't have any digits in it.
+        On a tie, the later one wins.  Returns None if there are no four-digit numbers.
+        """
+        after = bisect.bisect_left(self.years, self.count_before(start))
+        best, best_distance = None, None
+        if after < len(self.years):
+            best = self.years[after]
+            best_distance = self.starts[best] - stop
+        if after > 0:
+            before = self.years[after - 1]
+            if best is None or start - self.stop(before, length) < best_distance:
+                best = before
+        return best
+
+
 class CheckDate(MaybeNumber):
     MONTHS = {'Jan': 1, 'January': 1, 'Jan.': 1, 'Feb': 2, 'Feb.': 2, 'February': 2,
               'Mar': 3, 'Mar.': 3, 'March': 3, 'Apr': 4, 'Apr.': 4, 'April': 4,
-                     'May': 5, 'June': 6, 'Jun': 6, 'Jun.': 6, 'July': 7, 'Jul': 7, 'Jul.': 7,
+                     'May': 5, 'May.': 5, 'June': 6, 'Jun': 6, 'Jun.': 6, 'July': 7, 'Jul': 7, 'Jul.': 7,
               'Aug': 8, 'Aug.': 8, 'August': 8, 'Sept': 9, 'Sept.': 9, 'Sep': 9, 'Sep.': 9,
               'September': 9, 'Oct': 10, 'Oct.': 10, 'October': 10,
                      'Nov': 11, 'Nov.': 11, 'November': 11, 'Dec': 12, 'Dec.': 12, 'December': 12}
 
+    # Month names for every language the month trie knows, as {locale: {month name: month number}}.
+    # English is the only one on by default.  For more, see register_month_locale (FRENCH_MONTHS and SPANISH_MONTHS
+    # are at the bottom of this file).
+    MONTH_LOCALES = {'en': MONTHS}
+
+    # Flags for a digit cluster, one bit each.  Each flag is also the cluster's bit in the date_items mask named after it.
+    OVER_12, OVER_31, ZERO, FOUR_DIGITS = 1, 2, 4, 8
+    # The flags for every number up to 10,000.  Anything bigger than that gets the flags for 10,000.
+    _DATE_FLAGS = bytes((n > 12) | (n > 31) << 1 | (n == 0) << 2 | (999 < n < 10_000) << 3 for n in range(10_001))
+
+    # For convert_dates: splits a cell into runs of digits and runs of letters, keeping whatever is in between
+    _DATE_FIELDS = re.compile(r'(\d+|[^\W\d_]+)')
+    _EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+    # Process-wide cache of conversions for cached_convert_date and cached_isdate.  Report files repeat the same few
+    # dates (period ends, filing dates) thousands of times, so most lookups never have to build a CheckDate at all.
+    DATE_CACHE = ConversionCache(4096)
+
+    # Misspelled month names (ex. "Agust" in OCR'd text).  Turned off at 0.  Otherwise, a word that isn't a month name
+    # but is at most this many edits away from one, and has at least FUZZY_MONTH_MIN_LENGTH letters, counts as that
+    # month.  Short words are left alone since nearly every three-letter word is one edit from "May" or "Mar".
+    FUZZY_MONTH_DISTANCE = 0
+    FUZZY_MONTH_MIN_LENGTH = 5
+
+    # Word tries are shared by every instance rather than rebuilt for each one.  Keyed by the function that builds them,
+    # so classes that use the same builder share the same trie too.
+    _SHARED_TRIES = {}
+
 
     # OVERRIDE FOR __INIT__:
 
 
     def __init__(self, text="", token=' '):
         super().__init__(tokenize_by=token)
-        self._month_trie = import_month_trie(Trie())
+        self._month_trie = self.shared_trie('month')
+
+        # Where we are in the month trie, so each new letter is one step instead of a walk from the root.
+        # One cursor follows the whole string, and the other follows the current word.
+        self._whole_month_cursor = self._month_trie.cursor()
+        self._word_month_cursor = self._month_trie.cursor()
+        # The month bits for the last letter: (is_month, is_part_month, is_part_month_finished)
+        self._month_bits = (0, 0, 0)
+        # One entry per letter of (whole cursor, word cursor, month bits) from before it, so pop can put them back
+        self._month_cursor_history = []
+
+        # For misspelled months (see FUZZY_MONTH_DISTANCE): where the current run of letters started (None if the last
+        # letter wasn't one) and whether any of it was a month name
+        self._fuzzy_distance = self.FUZZY_MONTH_DISTANCE
+        self._letter_run = (None, False)
+        # One entry per letter of (letter run, month bits it turned on) from before it, for pop
+        self._fuzzy_history = []
 
         self._date_items = {
-            'date_numbers': [],
             'is_over_12': 0b0,
             'is_four_digits': 0b0,
             'is_over_31': 0b0,
             'is_zero': 0b0,
             'date_bitlength': 0,
-            # Date lambdas are what we'll use to assess whether or not the bit is turned on
-            # tuple format: (keyvalue, lambda expression, clear bit first?)
-            'date_lambdas': [('is_over_12', lambda x: x > 12, False),
-                             ('is_over_31', lambda x: x > 31, False),
-                             ('is_zero', lambda x: x == 0, True),
-                             ('is_four_digits', lambda x: 999 < x < 10_000, True)],
-            'indices': [],
+            # Three-number dates (ex. 12/15/2001) found so far, kept up to date by append and pop.
+            # format: {index in date_numbers where the date starts: index of its year}
+            'numeric_starts': {},
         }
+        # Where each digit cluster is, what number it makes, and its flags (see _DATE_FLAGS)
+        clusters = DigitClusters(year_flag=self.FOUR_DIGITS)
+        self._date_items['clusters'] = clusters
+        self._date_items['date_numbers'] = clusters.values
 
 
         for letter in text:
             self.append(letter)
 
 
+    # SHARED WORD TRIES:
+
+
+    @classmethod
+    def _word_trie_builders(cls):
+        """
+        The word tries this class uses, as {name: function that fills in an empty Trie and returns it}.
+        Override this in a subclass to register your own shared tries, the same way you'd add bitmasks in
+        _get_additive_functions:
+            builders = super()._word_trie_builders()
+            builders['english'] = import_english_trie
+            return builders
+        """
+        return {'month': cls._build_month_trie}
+
+    @classmethod
+    def shared_trie(cls, name):
+        """
+        Returns the shared trie registered under name.  It's built and frozen the first time anybody asks for it, and
+        after that every instance gets the same read-only trie.
+        """
+        builder = cls._word_trie_builders()[name]
+        try:
+            return cls._SHARED_TRIES[builder]
+        except KeyError:
+            pass
+        trie = builder(Trie()).freeze()
+        return cls._SHARED_TRIES.setdefault(builder, trie)
+
+    @classmethod
+    def _build_month_trie(cls, trie):
+        return import_month_trie(trie, cls.MONTH_LOCALES)
+
+    @classmethod
+    def register_month_locale(cls, locale, months):
+        """
+        Adds a language's month names, as {month name: month number}.  Every registered language goes into the same
+        month trie, so dates are still found in a single pass no matter how many languages there are.
+            CheckDate.register_month_locale('fr', FRENCH_MONTHS)
+
+        Registering on a subclass leaves its parents alone.  Objects that already exist keep the trie they started with.
+        """
+        if 'MONTH_LOCALES' not in cls.__dict__:
+            cls.MONTH_LOCALES = dict(cls.MONTH_LOCALES)
+        cls.MONTH_LOCALES[locale] = dict(months)
+
+        # Subclasses may share this class's table, so throw out every month trie built so far, not just this one's
+        for builder in list(cls._SHARED_TRIES):
+            if getattr(builder, '__func__', None) is CheckDate._build_month_trie.__func__:
+                del cls._SHARED_TRIES[builder]
+        # Cached conversions may have missed dates in the new language
+        cls.DATE_CACHE.clear()
+
+    @classmethod
+    def lookup_month(cls, word):
+        """Returns (locale, month number) if word is a month name in any registered language, otherwise None"""
+        return cls.shared_trie('month').get(word)
+
+    @classmethod
+    def _month_number(cls, word, fuzzy_distance=None):
+        """The month number for a month name, or None if it isn't one.  fuzzy_distance is for _fuzzy_month_number."""
+        found = cls.lookup_month(word)
+        if found is None:
+            return cls._fuzzy_month_number(word, fuzzy_distance)
+        return found[1]
+
+    @classmethod
+    def _fuzzy_month_number(cls, word, distance=None):
+        """
+        The month number for a misspelled month name, or None.  See FUZZY_MONTH_DISTANCE.
+        If the closest month names are for different months, it's too close to call, so that's None too.
+
+        :param distance: the most edits allowed.  Objects pass the distance they started with, and the default is the
+            class's FUZZY_MONTH_DISTANCE.
+        """
+        if distance is None:
+            distance = cls.FUZZY_MONTH_DISTANCE
+        if distance <= 0 or len(word) < cls.FUZZY_MONTH_MIN_LENGTH:
+            return None
+        trie = cls.shared_trie('month')
+        matches = trie.fuzzy_lookup(word, distance)
+        months = {trie.get(name)[1] for name, distance in matches if distance == matches[0][1]}
+        return months.pop() if len(months) == 1 else None
+
+
     # ADDITIONAL BITMASKS ADDED:
 
 
@@ -85,51 +300,14 @@ class CheckDate(MaybeNumber):
 
     def _get_additive_functions(self):
         """Override for this to add some bitmasks"""
-
-        # Some extra complex functions to figure out if it's a 1 or a 0 at the end
-
-        def get_pos_index(bitmask_names):
-            possible = []
-            for name in bitmask_names:
-                bitmask = getattr(self, f"_{name}")
-                if bitmask:
-                    possible += [self._get_slice_index(bitmask)]
-            if not possible:
-                return None
-            return max(possible)
-
-        def is_part_english_word(trie, letter):
-            """
-            This could get really difficult here as I'd need to backtrack, so let's just make this simple and
-            say that if there's a space, I'm treating that as a new opportunity to create a word.
-            """
-            # I say a space, but it could also be a period, whichever is closer
-            BITMASKS = ['is_space', 'isdot']
-            pos_index = get_pos_index(BITMASKS)
-            if pos_index is None:
-                return trie.is_wordstart(self.unwrapped + letter)
-            return trie.is_wordstart(self.unwrapped[pos_index + 1:] + letter)
-
-        def month_finish(letter):
-            BITMASKS = ['is_space', 'isdot']
-
-            if not self._is_part_month & 1:
-                return False
-            pos_index = get_pos_index(BITMASKS)
-            if pos_index is None:
-                return (self.unwrapped + letter).lower().capitalize() in self.MONTHS
-            return (self.unwrapped[pos_index + 1:] + letter).lower().capitalize() in self.MONTHS
-
-
-
-
         dictionary = super()._get_additive_functions()
         dictionary['is_comma'] = lambda letter: letter == ','
         dictionary['is_space'] = lambda letter: letter == ' '
         dictionary['isslash'] = lambda letter: letter == '/'
-        dictionary['is_month'] = lambda letter: self._month_trie.is_wordstart(self.unwrapped + letter)
-        dictionary['is_part_month'] = lambda letter: is_part_english_word(self._month_trie, letter) and letter != ' '
-        dictionary['is_part_month_finished'] = month_finish
+        # The month bits are worked out by _step_month_cursor before the bits are added
+        dictionary['is_month'] = lambda letter: self._month_bits[0]
+        dictionary['is_part_month'] = lambda letter: self._month_bits[1]
+        dictionary['is_part_month_finished'] = lambda letter: self._month_bits[2]
         dictionary['is_complete_english_word'] = lambda letter: self._trie.lookup(self._nodeword[0])
         dictionary['is_apostrophe'] = lambda letter: letter == "'" or letter == "’"
         dictionary['isfourdigits'] = lambda letter: self._isdigit & 0xf == 0xf
@@ -140,12 +318,92 @@ class CheckDate(MaybeNumber):
     # CHANGES TO APPEND AND POP FOR THE NEW BITMASKS
 
 
+    def _step_month_cursor(self, letter):
+        """
+        Moves the month cursor forward by one letter and works out the month bits for that letter:
+            is_month: the whole string so far is the start of a month name
+            is_part_month: the current word is the start of a month name.  A space or a period starts a new word.
+            is_part_month_finished: the current word is a complete month name
+        """
+        whole, word = self._whole_month_cursor, self._word_month_cursor
+        self._month_cursor_history.append((whole.save(), word.save(), self._month_bits))
+        whole.step(letter)
+
+        # A space or period ends the word.  It isn't part of a month itself, and the next word starts at the root.
+        if letter == ' ' or letter == '.':
+            word.reset()
+            self._month_bits = (whole.is_prefix, 0, 0)
+        elif word.step(letter):
+            self._month_bits = (whole.is_prefix, 1, word.is_word)
+        else:
+            self._month_bits = (whole.is_prefix, 0, 0)
+
+        if self._fuzzy_distance:
+            self._step_fuzzy_month(letter)
+
+    def _step_fuzzy_month(self, letter):
+        """
+        When a run of letters ends without any of it being a month name, checks if it's a misspelled one.  If it is,
+        its month bits are turned on after the fact, as if it had been spelled right.
+        This runs before the letter itself is added, so the run is still at the end of the bitmasks.
+        """
+        run_start, run_has_month = self._letter_run
+        added = (0, 0)
+
+        if letter.isalpha():
+            if run_start is None:
+                run_start, run_has_month = len(self.unwrapped), False
+            self._letter_run = (run_start, run_has_month or bool(self._month_bits[2]))
+
+        else:
+            added = self._set_fuzzy_month_bits()
+            self._letter_run = (None, False)
+
+        self._fuzzy_history.append(((run_start, run_has_month), added))
+
+    def _set_fuzzy_month_bits(self):
+        """
+        If the run of letters at the end of the string is a misspelled month, turns on its month bits.
+        Returns the bits that weren't already on as (part, finished), so they can be turned back off.
+        """
+        run_start, run_has_month = self._letter_run
+        if run_start is None or run_has_month:
+            return 0, 0
+        if self._fuzzy_month_number(self.unwrapped[run_start:], self._fuzzy_distance) is None:
+            return 0, 0
+        # The run is the last len(run) bits, and the month finishes on the lowest one
+        part = ((1 << (len(self.unwrapped) - run_start)) - 1) & ~self._is_part_month
+        finished = 1 & ~self._is_part_month_finished
+        self._is_part_month |= part
+        self._is_part_month_finished |= finished
+        return part, finished
+
+    @contextlib.contextmanager
+    def _trailing_fuzzy_month(self):
+        """
+        A misspelled month is only checked once something other than a letter comes after it, so one at the very end
+        of the string hasn't been.  This checks it and turns its bits on just for the with block, since more letters
+        may still be appended to the word.
+        """
+        part, finished = self._set_fuzzy_month_bits() if self._fuzzy_distance else (0, 0)
+        try:
+            yield
+        finally:
+            self._is_part_month &= ~part
+            self._is_part_month_finished &= ~finished
+
     def append(self, letter):
+        if isinstance(letter, int):
+            letter = chr(letter)
+        # Only step for letters the superclass will actually add
+        if isinstance(letter, str) and len(letter) == 1 and letter != '\0':
+            self._step_month_cursor(letter)
         super().append(letter)
 
-        # For indices -- if the current letter is not a digit but the previous one was
+        clusters = self._date_items['clusters']
+        # If the current letter is not a digit but the previous one was, the last cluster just ended
         if not self._isdigit & 1 and self._isdigit & 2:
-            self._date_items['indices'][-1].append(len(self.unwrapped) - 1)
+            clusters.stops[-1] = len(self.unwrapped) - 1
 
         # The rest only applies if the letter is a digit.
         # These are things to allow me to construct the date as I go, rather than slicing it afterwards
@@ -159,32 +417,39 @@ class CheckDate(MaybeNumber):
         # If the first bit is on (last letter I checked) and the second bit is on (letter before that) then additive
         if self._isdigit & 2:
             number = date_numbers[-1] * 10 + int(letter)
-            date_numbers[-1] = number
 
         # If the first bit is on (last letter I checked) but not the second bit, it's a new number
         else:
             scooch = True
             number = int(letter)
-            date_numbers.append(number)
             self._date_items['date_bitlength'] += 1
-            self._date_items['indices'].append([len(self.unwrapped) - 1])
 
-        for key, lambda_expression, clear_first in self._date_items['date_lambdas']:
-            if scooch:
-                self._date_items[key] <<= 1
-            elif clear_first:
-                self._date_items[key] &= ~0b1
-            self._date_items[key] |= lambda_expression(number)
+        flags = self._DATE_FLAGS[min(number, 10_000)]
+        self._set_date_flags(flags, new_cluster=scooch)
+        if scooch:
+            clusters.add(len(self.unwrapped) - 1, number, flags)
+        else:
+            clusters.update(number, flags)
 
+        self._update_numeric_date(len(date_numbers) - 1)
 
 
 
     def pop(self, masked=False):
         popped_item = super().pop(masked)
-
-        # To pop the ending index for a digit that may potentially keep going
+        whole, word, self._month_bits = self._month_cursor_history.pop()
+        self._whole_month_cursor.restore(whole)
+        self._word_month_cursor.restore(word)
+        if self._fuzzy_distance:
+            # Take back any misspelled month this letter turned on.  The masks are back to where they were then.
+            self._letter_run, (part, finished) = self._fuzzy_history.pop()
+            self._is_part_month &= ~part
+            self._is_part_month_finished &= ~finished
+
+        clusters = self._date_items['clusters']
+        # The string ends in a digit again, so the last cluster may potentially keep going
         if self._isdigit & 1 and not str(popped_item).isdigit():
-            self._date_items['indices'][-1].pop()
+            clusters.stops[-1] = None
 
         # date adjustment
         if not str(popped_item).isdigit():
@@ -194,22 +459,84 @@ class CheckDate(MaybeNumber):
         date_numbers = self._date_items['date_numbers']
 
         number = (date_numbers[-1] - int(str(popped_item))) // 10
-        if number == 0:
+        # The cluster is gone once its first digit is popped (not once the number is 0 -- ex. "05")
+        if clusters.starts[-1] == len(self.unwrapped):
             scooch = True
-            date_numbers.pop()
+            clusters.remove()
             self._date_items['date_bitlength'] -= 1
-            self._date_items['indices'].pop()
-
         else:
             scooch = False
-            date_numbers[-1] = number
 
-        for key, lamba_expression, clear_first in self._date_items['date_lambdas']:
-            if scooch:
-                self._date_items[key] >>= 1
-            elif clear_first:
-                self._date_items[key] &= 0
-            self._date_items[key] |= lamba_expression(number)
+        # When the whole number was popped, its bits just go away.  Otherwise the number got smaller, so its bits have
+        # to be worked out again.
+        if scooch:
+            self._drop_date_flags()
+        else:
+            flags = self._DATE_FLAGS[min(number, 10_000)]
+            self._set_date_flags(flags)
+            clusters.update(number, flags)
+
+        # The digit cluster we took away (or changed) was the last one in the only window it could be part of
+        if scooch:
+            self._date_items['numeric_starts'].pop(len(date_numbers) - 2, None)
+        else:
+            self._update_numeric_date(len(date_numbers) - 1)
+
+    def _set_date_flags(self, flags, new_cluster=False):
+        """
+        Puts the last cluster's flags into is_over_12, is_over_31, is_zero and is_four_digits.
+        With new_cluster, the masks are moved over to make room for it first.  Otherwise, its old bits are replaced.
+        """
+        items = self._date_items
+        shift = 1 if new_cluster else 0
+        # Clearing the lowest bit does nothing after a shift, so the same line works either way
+        keep = ~1 >> shift
+        items['is_over_12'] = (items['is_over_12'] << shift) & keep | flags & 1
+        items['is_over_31'] = (items['is_over_31'] << shift) & keep | flags >> 1 & 1
+        items['is_zero'] = (items['is_zero'] << shift) & keep | flags >> 2 & 1
+        items['is_four_digits'] = (items['is_four_digits'] << shift) & keep | flags >> 3
+
+    def _drop_date_flags(self):
+        """Takes the last cluster out of is_over_12, is_over_31, is_zero and is_four_digits"""
+        items = self._date_items
+        items['is_over_12'] >>= 1
+        items['is_over_31'] >>= 1
+        items['is_zero'] >>= 1
+        items['is_four_digits'] >>= 1
+
+    def _update_numeric_date(self, last):
+        """
+        Keeps date_items['numeric_starts'] up to date after the last digit cluster changes.
+
+        A three-number date is three digit clusters with a single character between each, and the year first or last.
+        When a digit is added or popped, the only window that can change is the one ending at the last cluster.
+        Every window before that is made of finished numbers, so it was already decided and stays that way.
+        """
+        numeric_starts = self._date_items['numeric_starts']
+        start = last - 2
+        numeric_starts.pop(start, None)
+        if start < 0:
+            return
+
+        starts, stops = self._date_items['clusters'].starts, self._date_items['clusters'].stops
+        if stops[start] + 1 != starts[start + 1] or stops[start + 1] + 1 != starts[last]:
+            return
+
+        # The last cluster is the LSB in the informational bitmasks
+        is_four_digits = self._date_items['is_four_digits']
+        if is_four_digits & 0b001:
+            year = last
+        elif is_four_digits & 0b100:
+            year = start
+        else:
+            return
+
+        try:
+            is_valid = self._is_valid_date_comprehensive(start)
+        except (ValueError, KeyError, IndexError):
+            is_valid = False
+        if is_valid:
+            numeric_starts[start] = year
 
 
     # DATE DETECTION
@@ -217,8 +544,19 @@ class CheckDate(MaybeNumber):
 
 
     def isdate(self):
-        """The public method that sees if the item inside this object is or contains a date"""
-        starts, monthwords = self._detect_date_locations()[:2]
+        """
+        The public method that sees if the item inside this object is or contains a date.
+        Three-number dates are found while the letters are added, so this is O(1) unless there's a month name.
+        """
+        if not self._isfourdigits:
+            return False
+        if self._date_items['numeric_starts']:
+            return True
+        with self._trailing_fuzzy_month():
+            if not self._is_part_month_finished:
+                return False
+            starts, monthwords = self._letter_month_find_date()[:2]
+
         for start, monthword in zip(starts, monthwords):
             if self._isdate(start, monthword) is not False:
                 return True
@@ -233,7 +571,9 @@ class CheckDate(MaybeNumber):
         try:
             month = None
             if monthword is not None:
-                month = self.MONTHS[monthword]
+                month = self._month_number(monthword, self._fuzzy_distance)
+                if month is None:
+                    return False
             return self._is_valid_date_comprehensive(start, month)
         except (ValueError, KeyError):
             return False
@@ -548,11 +888,12 @@ class CheckDate(MaybeNumber):
         monthword = []
         where_monthwords = []
         # Start with letter months
-        if self._is_part_month_finished:
-            l_starts, l_monthwords, l_where = self._letter_month_find_date()
-            monthword += l_monthwords
-            starts += l_starts
-            where_monthwords += l_where
+        with self._trailing_fuzzy_month():
+            if self._is_part_month_finished:
+                l_starts, l_monthwords, l_where = self._letter_month_find_date()
+                monthword += l_monthwords
+                starts += l_starts
+                where_monthwords += l_where
         # Even if there is a letter month, it may also contain a number date as well
         nd_starts = self._find_three_numbers_in_pattern()
         starts += nd_starts
@@ -594,56 +935,23 @@ class CheckDate(MaybeNumber):
                     months_set.add((start_index, month_text[:q]))
 
             # If there's more than one place where there's a four digit number, choose the one closest to the month
-            year_index = []
-            where_year = None
-            curr_distance = float('inf')
-
-            year_bitmask = self._date_items['is_four_digits']
-            while year_bitmask:
-                i = self._get_slice_index(year_bitmask, self._date_items['date_bitlength'] - 1)
-                indices = self._date_items['indices'][i]
-                if len(indices) == 1:
-                    indices.append(len(self.unwrapped))
-                # Get distance
-                if min(indices) > end_index:
-                    distance = min(indices) - end_index
-                elif max(indices) < start_index:
-                    distance = start_index - max(indices)
-                else:
-                    raise IndexError("Something went wrong")
-
-                # print(f"Month: {start_index}, {end_index};   Year: {indices} {i};   Distance: {distance}")
-                if distance < curr_distance:
-                    year_index = indices
-                    where_year = i
-                    curr_distance = distance
-
-                year_bitmask = year_bitmask & (year_bitmask - 1)
+            clusters = self._date_items['clusters']
+            where_year = clusters.nearest_year(start_index, end_index, len(self.unwrapped))
 
             # now we look at the digit clusters surrounding the start and end of the month.
-            after_end = (1 << (self._len_bitmasks - end_index + 1)) - 1
-            previous_integers = ~after_end & self._isdigit
-
-            # Prev integers:
-            indices_before = self._loop_bitmask(previous_integers)
-
-            # After integers:
-            after_indices = self._date_items['indices'][len(indices_before):]
+            count_before = clusters.count_before(start_index)
 
             # See where the year is in relation to the month
             startval = None
             # If the year is the first number after the month word, then the day is probably just before the month word
             # If the year is the second number after month word, probably month DD YYY
-            if year_index in after_indices:
-                year_loc = after_indices.index(year_index)
-                if year_loc <= 2:
+            if where_year is not None and where_year >= count_before:
+                if where_year - count_before <= 2:
                     startval = where_year - 1
 
             # If the year comes first, could be "in the year YYYY, on the DDth day in the month of monthname"
-            elif year_index in indices_before:
-                year_loc = indices_before.index(year_index)
-                if len(indices_before) - year_loc <= 2:
-                    startval = where_year
+            elif where_year is not None and count_before - where_year <= 2:
+                startval = where_year
 
             if startval is not None and startval not in starts_set:
                 starts.append(startval)
@@ -660,90 +968,204 @@ class CheckDate(MaybeNumber):
 
 
     def _find_three_numbers_in_pattern(self):
-        """For finding the pattern of three numbers separated by a single symbol"""
-        # Check for all year numbers to see if they are good candidates.  Then see what the spaces are between
-        # different integer clusters around the year
-        start_date = []
+        """
+        For finding the pattern of three numbers separated by a single symbol.
+        These are found as the letters are added (see _update_numeric_date), so all this does is put them in order:
+        latest year first, and for each year, the date that ends with it before the one that starts with it.
+        """
+        numeric_starts = self._date_items['numeric_starts']
+        return sorted(numeric_starts, key=lambda start: (-numeric_starts[start], start != numeric_starts[start] - 2))
+
+
+    # CACHED CONVERSION
+
+
+    @classmethod
+    def _cached_dates(cls, text, token=' '):
+        """Returns a tuple of all the dates in text, going through DATE_CACHE"""
+        # The fuzzy month settings change what counts as a date, so they're part of the key
+        key = (cls, text, token, cls.FUZZY_MONTH_DISTANCE, cls.FUZZY_MONTH_MIN_LENGTH)
+        dates = cls.DATE_CACHE.get(key)
+        if dates is None:
+            try:
+                dates = cls(text, token).convert_date()
+            except ValueError:
+                dates = ()
+            dates = tuple(dates) if isinstance(dates, list) else (dates,) if dates else ()
+            cls.DATE_CACHE.put(key, dates)
+        return dates
+
+    @classmethod
+    def cached_convert_date(cls, text, token=' '):
+        """
+        Same as cls(text, token).convert_date(), but the result is kept in the process-wide DATE_CACHE.
+        Just like convert_date, raises a ValueError if there's no date.
+        """
+        dates = cls._cached_dates(text, token)
+        if not dates:
+            raise ValueError(f"{text} does not contain any detected dates")
+        if len(dates) == 1:
+            return dates[0]
+        return list(dates)
 
-        bitmask = self._date_items['is_four_digits']
-        while bitmask:
-            i = self._get_slice_index(bitmask, self._date_items['date_bitlength'] - 1)
-            year_index = self._date_items['indices'][i]
-            if len(year_index) == 1:
-                year_index.append(len(self.unwrapped))
-
-            # Now we need to figure out how much distance is between the different integers surrounding the year
-
-            # Since year can't go in the middle, I'll do 2 ranges: one with year at start and one with year at end.
-            # So it'll be
-            #   range(-2, 1) where each number in range is added to year_i
-            #   range(0, 3) where each number in range is added to year_i
-            # Since I don't want to iterate unnecessarily, I'll optimize this by using mins and maxes
-            #   max(-2 + i, 0) => it should be -2 + i, but if that's negative, then start at 0
-            #   min(1 + i, end) => it should be 1 + i, but if it's longer than my list, then truncate
-            #   min(i + 3, end) => it should be i + 3, but if it's longer than my list, then truncate
-            end = self._date_items['date_bitlength']
-            for my_range in [range(max(-2 + i, 0), min(1 + i, end)), range(i, min(i + 3, end))]:
-                start_x = None
-                cluster_length = 0
-                prev_index = None
-
-                for x in my_range:
-                    index_of_cluster = self._date_items['indices'][x]
-
-                    # Now I go through and tally up how many are 1 apart from each other
-
-                    if prev_index is None:
-                        cluster_length, start_x = 1, x
-                    # More than one apart
-                    elif prev_index[-1] + 1 != index_of_cluster[0]:
-                        cluster_length, start_x = 1, x
-                    else:
-                        cluster_length += 1
-
-                    prev_index = index_of_cluster
-                    if cluster_length == 3:
-                        break
+    @classmethod
+    def cached_isdate(cls, text, token=' '):
+        """Same as cls(text, token).isdate(), but through the process-wide DATE_CACHE"""
+        return bool(cls._cached_dates(text, token))
 
-                # Outside of the inner loop
-                if cluster_length < 3:
-                    continue
+    @classmethod
+    def set_date_cache_size(cls, maxsize):
+        """Replaces DATE_CACHE with a new, empty cache of the given size"""
+        cls.DATE_CACHE = ConversionCache(maxsize)
 
-                if self._is_valid_date_comprehensive(start_x):
-                    start_date.append(start_x)
+    @classmethod
+    def date_cache_stats(cls):
+        """Hits, misses, evictions and size of DATE_CACHE"""
+        return cls.DATE_CACHE.stats()
 
-            bitmask = bitmask & (bitmask - 1)
-        return start_date
 
+    # BATCH CONVERSION FOR DATE COLUMNS
 
 
+    # A column of dates is almost always written the same way all the way down.  So rather than working out the
+    # day/month/year order for every single cell, convert_dates figures the format out once from a sample and then
+    # applies it directly.
+    #
+    # A "format" is the cell's shape: its digit fields, month names and other words, and the exact text between them.
+    # For example, "12/15/2001" and "01/02/2003" both have the shape (#, '/', #, '/', #).  For each shape seen in the
+    # sample, we try every way of assigning year/month/day to its fields.  We keep the one that makes a valid date out
+    # of every sample cell with that shape, and that agrees most often with what the regular heuristic decided.
+    # That way, a column of day-first dates is read day-first even for cells like 01/02/2003, which are ambiguous
+    # on their own.
+    #
+    # Anything that doesn't match a learned format goes through the usual CheckDate(cell).convert_date().
 
-    def _loop_bitmask(self, bitmask):
-        indices = collections.deque([])
-        while bitmask:
-            pos_index = self._get_slice_index(bitmask, len(self.unwrapped))
-            neg_index = len(self.unwrapped) - (pos_index - 1)
 
-            stop = pos_index
+    @classmethod
+    def convert_dates(cls, cells, sample_size=100, epoch=False):
+        """
+        Converts a whole column of dates.
 
-            scooched_bitmask = bitmask >> (neg_index - 1)
-            if scooched_bitmask == 1:
-                break
+        :param cells: iterable of strings.  It's only iterated over once, so it can be a generator.
+        :param sample_size: how many cells from the top of the column are used to learn the format
+        :param epoch: if True, the dates are given as days since 1970-01-01 instead of as ordinals
+        :return: (values, nulls).  values is an array.array('q') of date.toordinal() (or epoch days).  nulls is a
+            bytearray with a 1 wherever the cell wasn't a single date (the value there is 0).
+        """
+        cells = iter(cells)
+        sample = list(itertools.islice(cells, sample_size))
+        formats = cls._learn_date_formats(sample)
+
+        values = array.array('q')
+        nulls = bytearray()
+        offset = cls._EPOCH_ORDINAL if epoch else 0
+
+        for cell in itertools.chain(sample, cells):
+            date = cls._date_from_format(cell, formats)
+            if date is None:
+                date = cls._convert_single_date(cell)
+            if date is None:
+                values.append(0)
+                nulls.append(1)
+            else:
+                values.append(date.toordinal() - offset)
+                nulls.append(0)
+        return values, nulls
+
+    @classmethod
+    def _convert_single_date(cls, cell):
+        """The regular (slow) way: returns the date in the cell, or None if there isn't exactly one"""
+        dates = cls._cached_dates(cell)
+        return dates[0] if len(dates) == 1 else None
+
+    @classmethod
+    def _date_shape(cls, cell):
+        """
+        Splits the cell for convert_dates.  Returns (shape, fields, month):
+            shape: tuple of the text between fields, with '#' for a digit field and 'M' for the month name
+            fields: the digit fields as ints, in order
+            month: the month number if there's a month name, otherwise None
+        """
+        parts = cls._DATE_FIELDS.split(cell)
+        fields = []
+        month = None
+        # The odd indices are the fields themselves
+        for i in range(1, len(parts), 2):
+            part = parts[i]
+            if part.isdigit():
+                fields.append(int(part))
+                parts[i] = '#'
+            elif month is None and cls._month_number(part) is not None:
+                month = cls._month_number(part)
+                parts[i] = 'M'
+            else:
+                parts[i] = part.lower()
+        return tuple(parts), fields, month
 
-            new_length = len(self.unwrapped) - neg_index + 1
-            cluster_length = new_length - self._get_slice_index(~scooched_bitmask, new_length)
+    @classmethod
+    def _learn_date_formats(cls, sample):
+        """
+        Works out a format for each shape in the sample.
+        Returns {shape: (index of year field, index of month field or None, index of day field)}.
+        """
+        # shape -> list of (fields, month, date from the heuristic) for each sample cell with that shape
+        by_shape = collections.defaultdict(list)
+        for cell in sample:
+            date = cls._convert_single_date(cell)
+            if date is None:
+                continue
+            shape, fields, month = cls._date_shape(cell)
+            if len(fields) == (2 if month is not None else 3):
+                by_shape[shape].append((fields, month, date))
+
+        formats = {}
+        for shape, rows in by_shape.items():
+            has_month = rows[0][1] is not None
+            roles = ('year', 'day') if has_month else ('year', 'month', 'day')
+            best, best_agreed = None, 0
+
+            for order in itertools.permutations(range(len(roles))):
+                where = dict(zip(roles, order))
+                key = (where['year'], where.get('month'), where['day'])
+                agreed = 0
+                for fields, month, date in rows:
+                    candidate = cls._date_from_fields(fields, month, key)
+                    if candidate is None:
+                        break
+                    agreed += candidate == date
+                else:
+                    if agreed > best_agreed:
+                        best, best_agreed = key, agreed
 
-            start = pos_index - cluster_length
-            blank_these_bits_please = (1 << (neg_index + cluster_length - 1)) - 1
+            if best is not None:
+                formats[shape] = best
+        return formats
 
-            if start < 0:
-                start = 0
-            elif stop < 0:
-                break
-
-            indices.appendleft([start, stop])
-            bitmask = bitmask & ~blank_these_bits_please
-        return indices
+    @staticmethod
+    def _date_from_fields(fields, month, where):
+        """Makes the date using the field indices in where.  Returns None if it isn't a valid date."""
+        yeardex, monthdex, daydex = where
+        year = fields[yeardex]
+        # Same as the heuristic: years have four digits
+        if not 999 < year < 10_000:
+            return None
+        if monthdex is not None:
+            month = fields[monthdex]
+        try:
+            return datetime.date(year, month, fields[daydex])
+        except ValueError:
+            return None
+
+    @classmethod
+    def _date_from_format(cls, cell, formats):
+        """The fast way: uses a learned format.  Returns None if the cell doesn't fit any of them."""
+        if not formats:
+            return None
+        shape, fields, month = cls._date_shape(cell)
+        where = formats.get(shape)
+        if where is None:
+            return None
+        return cls._date_from_fields(fields, month, where)
 
 
     @staticmethod
@@ -763,28 +1185,32 @@ class CheckDate(MaybeNumber):
     ####  A new version of tokenize and some piecemeal methods to help you do custom loops
 
 
-    def get_date_indices(self):
-        """Gets all date indices"""
-        # First, get all indices where a date appears.  Get the index where it starts and the index where it ends
-        date_locations = []
+    def _iter_date_locations(self):
+        """Yields (starting index, ending index, datetime.date) for every date found in the string"""
         dateindex_locations, date_monthwords, where_monthwords = self._detect_date_locations()
         for start_loc, monthword, monthword_indices in zip(dateindex_locations, date_monthwords, where_monthwords):
             my_date = self._isdate(start=start_loc, monthword=monthword)
             if my_date is False:
                 continue
             length = 3 if monthword is None else 2
-            starting_index = self._date_items['indices'][start_loc][0]
-            e = self._date_items['indices'][start_loc + length - 1]
-            if len(e) == 1:
-                ending_index = len(self.unwrapped)
-            else:
-                ending_index = e[-1]
+            clusters = self._date_items['clusters']
+            starting_index = clusters.starts[start_loc]
+            ending_index = clusters.stop(start_loc + length - 1, len(self.unwrapped))
 
             if monthword_indices is not None:
                 starting_index = min(starting_index, monthword_indices[0])
                 ending_index = max(ending_index, monthword_indices[-1])
 
-            date_locations.append((starting_index, ending_index))
+            yield starting_index, ending_index, my_date
+
+    def iter_dates(self):
+        """Yields (starting index, ending index, datetime.date) for every date in the string, in order"""
+        yield from sorted(self._iter_date_locations(), key=lambda x: x[0])
+
+    def get_date_indices(self):
+        """Gets all date indices"""
+        # First, get all indices where a date appears.  Get the index where it starts and the index where it ends
+        date_locations = [(start, stop) for start, stop, _ in self._iter_date_locations()]
 
         # Sort these so I can pop them later
         date_locations.sort(key=lambda x: x[0])
@@ -985,8 +1411,101 @@ class CheckDate(MaybeNumber):
         return
 
     def iter_tokens_forward(self, bittocomp=0, subclass=str):
-        mylist = list(self.iter_tokens(bittocomp, subclass))
-        yield from reversed(mylist)
+        """
+        Same as iter_tokens, but forward.  Splitting on the token (bittocomp=0) goes through iter_token_spans, so the
+        values come from this object's date and number detection instead of a new object per token.
+
+        The tokens are the same as iter_tokens gives, except around a date that only fills part of its token.  Here,
+        the whole token is the date (ex. "3/4/2020." or "13on.August 11th 1999").  iter_tokens and tokenize_self
+        sometimes split the rest of the token off instead, depending on where the date is in it.
+        """
+        if bittocomp != 0:
+            mylist = list(self.iter_tokens(bittocomp, subclass))
+            yield from reversed(mylist)
+            return
+
+        if not self.unwrapped:
+            return
+        if self._istoken == 0:
+            yield 0, len(self.unwrapped)
+            return
+
+        for start, stop, kind, value in self.iter_token_spans():
+            if subclass is None:
+                yield start, stop
+            elif kind == 'text':
+                yield (start, stop), subclass(value)
+            else:
+                yield (start, stop), value
+
+    def iter_token_spans(self):
+        """
+        Iterates FORWARD over the tokens, yielding (start_index, stop_index, kind, value) for each one:
+            kind 'date':    value is the datetime.date
+            kind 'number':  value is the number
+            kind 'text':    value is the slice of the string
+        The tokens are split on the token character, same as iter_tokens, except that a date is never split: the date
+        token is every token the date touches, joined together (ex. "(12/15/2001)," or "Dec. 31, 2020").
+
+        Unlike iter_tokens, this never creates a new object per token.  The dates come from this object's date
+        detection, the numbers are checked against slices of this object's bitmasks, and we leap from token to
+        token using the istoken bitmask.  The only things created are the values being yielded.
+        """
+        length = len(self.unwrapped)
+        position = 0
+        # There's an extra "date" at the very end so the tokens after the last real date get yielded too
+        dates = sorted(self._iter_date_locations(), key=lambda x: x[0])
+        dates.append((length, length, None))
+
+        for date_start, date_stop, date in dates:
+            # If two dates overlap (or share a token), keep whichever one starts first
+            if date_start < position:
+                continue
+            if date is None:
+                yield from self._iter_spans_between(position, length)
+                return
+            # Widen the date out to the token characters on either side of it
+            token_start = self._token_start_before(position, date_start)
+            token_stop = self._next_index_with_bit(self._istoken, date_stop, length)
+            yield from self._iter_spans_between(position, token_start)
+            yield token_start, token_stop, 'date', date
+            position = token_stop
+
+    def _iter_spans_between(self, start, stop):
+        """The token spans for iter_token_spans in the range(start, stop)"""
+        istoken = self._istoken
+        position = start
+        while position < stop:
+            # Leap over any token characters, then leap to the next token character
+            position = self._next_index_with_bit(~istoken, position, stop)
+            if position >= stop:
+                return
+            end = self._next_index_with_bit(istoken, position, stop)
+
+            if self._isnumber_between(position, end):
+                yield position, end, 'number', self._number_between(position, end)
+            else:
+                yield position, end, 'text', self.unwrapped[position:end]
+            position = end
+
+    def _token_start_before(self, start, index):
+        """Where the token that index is in starts: just after the last token character in range(start, index)"""
+        between = (self._istoken >> (len(self.unwrapped) - index)) & ((1 << (index - start)) - 1)
+        if not between:
+            return start
+        # The lowest bit on is the last token character before index
+        return index - ((between & -between).bit_length() - 1)
+
+    def _next_index_with_bit(self, bitmask, start, stop):
+        """
+        The first index in range(start, stop) whose bit is on in bitmask, or stop if there isn't one.
+        Works for inverted (negative) bitmasks too.
+        """
+        length = len(self.unwrapped)
+        remaining = bitmask & ((1 << (length - start)) - 1)
+        if not remaining:
+            return stop
+        return min(length - remaining.bit_length(), stop)
 
 
 
@@ -1047,19 +1566,29 @@ class CheckDate(MaybeNumber):
         return indices
 
 
-def import_month_trie(mytrie):
-    """Adds all the months to a trie"""
-    months = [["Jan", ["uary", ".", ""]], ["Feb", ["ruary", ".", ""]], ["Mar", ["ch", ".", ""]],
-              ["Apr", ["il", ".", ""]], ["May", ["", "."]], ["Jun", ["e", ".", ""]], ["Jul", ["y", ".", ""]],
-              ["Aug", ["ust", ".", ""]], ["Sep", ["t", "t.", ".", "", "tember", "temb", "temb."]],
-              ["Oct", ["ober", ".", ""]], ["Nov", ["ember", ".", ""]], ["Dec", ["ember", ".", ""]],
-              ]
-    for month_cluster in months:
-        stem = month_cluster[0]
-        node = mytrie.insert_prefix(stem)
-        for suffix in month_cluster[1]:
-            mytrie.insert_from_node(suffix, node)
+def import_month_trie(mytrie, locales=None):
+    """
+    Adds the month names to a trie.  locales is {locale: {month name: month number}}, and defaults to English.
+    The end of each name holds (locale, month number).  If two languages share a name, the first one keeps it.
+    """
+    if locales is None:
+        locales = {'en': CheckDate.MONTHS}
+    for locale, months in locales.items():
+        for name, number in months.items():
+            if mytrie.get(name) is None:
+                mytrie.insert(name, value=(locale, number))
     return mytrie
 
 
+FRENCH_MONTHS = {'Janvier': 1, 'Janv': 1, 'Janv.': 1, 'Février': 2, 'Fevrier': 2, 'Févr': 2, 'Févr.': 2, 'Fevr': 2,
+                 'Fevr.': 2, 'Mars': 3, 'Avril': 4, 'Avr': 4, 'Avr.': 4, 'Mai': 5, 'Juin': 6, 'Juillet': 7,
+                 'Juil': 7, 'Juil.': 7, 'Août': 8, 'Aout': 8, 'Septembre': 9, 'Sept': 9, 'Sept.': 9,
+                 'Octobre': 10, 'Oct': 10, 'Oct.': 10, 'Novembre': 11, 'Nov': 11, 'Nov.': 11,
+                 'Décembre': 12, 'Decembre': 12, 'Déc': 12, 'Déc.': 12, 'Dec': 12, 'Dec.': 12}
 
+SPANISH_MONTHS = {'Enero': 1, 'Ene': 1, 'Ene.': 1, 'Febrero': 2, 'Feb': 2, 'Feb.': 2, 'Marzo': 3, 'Mar': 3,
+                  'Mar.': 3, 'Abril': 4, 'Abr': 4, 'Abr.': 4, 'Mayo': 5, 'May': 5, 'Junio': 6, 'Jun': 6,
+                  'Jun.': 6, 'Julio': 7, 'Jul': 7, 'Jul.': 7, 'Agosto': 8, 'Ago': 8, 'Ago.': 8,
+                  'Septiembre': 9, 'Setiembre': 9, 'Sept': 9, 'Sept.': 9, 'Sep': 9, 'Sep.': 9,
+                  'Octubre': 10, 'Oct': 10, 'Oct.': 10, 'Noviembre': 11, 'Nov': 11, 'Nov.': 11,
+                  'Diciembre': 12, 'Dic': 12, 'Dic.': 12}
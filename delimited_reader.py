@@ -0,0 +1,465 @@
+"""
+(c) 2022 Shoshi (Sharon) Cooper.  No duplication is permitted for commercial use.  Any significant changes made must be
+stated explicitly and the original source code, if used, must be available and credited to Shoshi (Sharon) Cooper.
+
+A reader for delimited files (*.csv and friends) built around MaybeNumber.
+
+This is the original problem MaybeNumber was written for (see the README): text.split(',') doesn't work when the
+delimiter also appears inside quoted cells, so the quotes have to be tracked as we go.  RowParser does that in a
+single pass and converts each cell with MaybeNumber the moment the cell is finished.
+
+RowParser is push-based -- you feed() it text in whatever chunks you have, and it hands back the rows it was able to
+finish.  A row (or a quoted cell) that is split across two chunks is simply carried over to the next feed().
+That makes it easy to put on top of files, sockets, or asyncio streams:
+
+    iter_rows(file)             for ordinary (blocking) files
+    aiter_rows(stream_reader)   an async iterator for asyncio streams or async iterables of chunks
+    DelimitedReader(path)       for files that keep growing.  Can checkpoint where it is and resume from there later.
+                                Also reads gzip/bz2/xz files directly, decompressing in a background thread.
+"""
+import asyncio
+import bz2
+import codecs
+import collections
+import gzip
+import lzma
+import queue
+import threading
+import weakref
+from maybe_number_superclass import MaybeNumber, ConversionCache
+
+
+# Everything needed to pick up parsing where we left off.  The unfinished cell is kept as text: cells are only
+# converted to MaybeNumbers once they're finished, so the text *is* the in-progress MaybeNumber state.
+Checkpoint = collections.namedtuple('Checkpoint', ['offset', 'row', 'cell', 'in_quotes', 'quote_pending'])
+
+
+# How to open each kind of compressed file, and the magic bytes each one starts with
+COMPRESSION_OPENERS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+COMPRESSION_MAGIC = {b'\x1f\x8b': 'gzip', b'BZh': 'bz2', b'\xfd7zXZ\x00': 'xz'}
+
+# Encodings whose decoder reads the byte order mark at the start of the file, and the marks each one can start with
+BOM_ENCODINGS = {'utf-8-sig': (codecs.BOM_UTF8,),
+                 'utf-16': (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE),
+                 'utf-32': (codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)}
+
+
+class RowParser(object):
+    """
+    Splits delimited text into rows, converting each cell as it goes.
+    """
+    __slots__ = ["_delimiter", "_quotechar", "_subclass", "_cache", "_token", "_cell", "_row", "_in_quotes",
+                 "_quote_pending"]
+
+    def __init__(self, delimiter=',', quotechar='"', subclass=MaybeNumber, cache=None, tokenize_by=' '):
+        """
+        :param delimiter: single character separating the cells
+        :param quotechar: single character used to quote cells.  Doubled inside quotes ("") it means a literal quote.
+        :param subclass: the MaybeNumber class used to convert cells
+        :param cache: None, an int (size of a new ConversionCache), or a ConversionCache to share between parsers
+        :param tokenize_by: passed through to each MaybeNumber
+        """
+        if len(delimiter) != 1 or len(quotechar) != 1:
+            raise ValueError("Delimiter and quotechar must be single characters")
+        if isinstance(cache, int) and not isinstance(cache, bool):
+            cache = ConversionCache(cache)
+
+        self._delimiter = delimiter
+        self._quotechar = quotechar
+        self._subclass = subclass
+        self._cache = cache
+        self._token = tokenize_by
+
+        # State that carries over between calls to feed()
+        self._cell = []
+        self._row = []
+        self._in_quotes = False
+        # Set when we see a quote inside quotes.  We don't know yet if it closes the cell or is the first half of ""
+        self._quote_pending = False
+
+    @property
+    def cache(self):
+        return self._cache
+
+    def _finish_cell(self):
+        text = "".join(self._cell)
+        self._cell = []
+        self._row.append(self._subclass._convert_cell(text, self._cache, self._token)[0])
+
+    def _finish_row(self, rows):
+        """Returns True if a row was actually added"""
+        # Blank lines don't count as rows
+        added = bool(self._row or self._cell)
+        if added:
+            self._finish_cell()
+            rows.append(self._row)
+        self._row = []
+        return added
+
+    def feed(self, text):
+        """
+        Parses the next chunk of text.
+        Returns a list of every row that was completed by this chunk.  Anything left over is kept for the next feed.
+        """
+        rows = []
+        self._parse(text, 0, rows)
+        return rows
+
+    def _parse(self, text, pos, rows, one_row=False):
+        """
+        Parses text starting at index pos, adding finished rows to rows.
+        Returns the index it stopped at: the end of the text, or (if one_row) just past the first finished row.
+        """
+        delimiter, quotechar = self._delimiter, self._quotechar
+        cell = self._cell
+
+        for i in range(pos, len(text)):
+            letter = text[i]
+            if self._quote_pending:
+                self._quote_pending = False
+                # "" inside quotes is an escaped quote
+                if letter == quotechar:
+                    cell.append(letter)
+                    continue
+                self._in_quotes = False
+
+            if self._in_quotes:
+                if letter == quotechar:
+                    self._quote_pending = True
+                else:
+                    cell.append(letter)
+            elif letter == quotechar:
+                self._in_quotes = True
+            elif letter == delimiter:
+                self._finish_cell()
+                cell = self._cell
+            elif letter == '\n':
+                added = self._finish_row(rows)
+                cell = self._cell
+                if one_row and added:
+                    return i + 1
+            elif letter != '\r':
+                cell.append(letter)
+
+        return len(text)
+
+    def state(self):
+        """
+        The parser's state partway through a row: (cells finished so far, text of the unfinished cell, in_quotes,
+        quote_pending).  Everything in here is plain data, so it's cheap to save.
+        """
+        return list(self._row), "".join(self._cell), self._in_quotes, self._quote_pending
+
+    def restore(self, row, cell, in_quotes, quote_pending):
+        """Puts the parser back into a state returned by state()"""
+        self._row = list(row)
+        self._cell = list(cell)
+        self._in_quotes = in_quotes
+        self._quote_pending = quote_pending
+
+    def close(self):
+        """Call once the input is finished.  Returns the final row as a list of rows (empty if there isn't one)"""
+        rows = []
+        self._quote_pending = False
+        self._in_quotes = False
+        self._finish_row(rows)
+        return rows
+
+
+class BackgroundReader(object):
+    """
+    Reads a file in a background thread, keeping up to `prefetch` chunks ready in a bounded queue.
+
+    This is for compressed files: zlib, bz2 and lzma all release the GIL while they decompress, so the next chunks
+    are decompressed while the main thread is busy parsing the current one.
+    """
+
+    def __init__(self, fileobj, chunk_size=1 << 16, prefetch=4):
+        self._file = fileobj
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._stop = threading.Event()
+        self._done = False
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        """Waits for room in the queue, unless we've been told to stop.  Returns False if we have."""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _fill(self):
+        try:
+            chunk = self._file.read(self._chunk_size)
+            while chunk and self._put(chunk):
+                chunk = self._file.read(self._chunk_size)
+            # An empty chunk is the end of the file
+            self._put(b'')
+        except Exception as error:
+            # Hand the error over to the reading thread so it gets raised there
+            self._put(error)
+
+    def read(self, size=-1):
+        """Returns the next chunk (size is ignored -- chunks are always chunk_size).  Returns b'' at the end."""
+        if self._done:
+            return b''
+        chunk = self._queue.get()
+        if isinstance(chunk, Exception):
+            self._done = True
+            raise chunk
+        if not chunk:
+            self._done = True
+        return chunk
+
+    def close(self):
+        self._stop.set()
+        # Make room in case the thread is waiting on a full queue
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._thread.join()
+        self._file.close()
+
+
+def _sniff_compression(fileobj):
+    """Looks at the first few bytes of the file to see if it's compressed.  Returns a COMPRESSION_OPENERS key or None"""
+    longest = max(len(magic) for magic in COMPRESSION_MAGIC)
+    if hasattr(fileobj, 'peek'):
+        start = fileobj.peek(longest)[:longest]
+    elif fileobj.seekable():
+        position = fileobj.tell()
+        start = fileobj.read(longest)
+        fileobj.seek(position)
+    else:
+        return None
+
+    for magic, compression in COMPRESSION_MAGIC.items():
+        if start.startswith(magic):
+            return compression
+    return None
+
+
+def _close_files(file, raw_file, owns_file):
+    """Closes what a DelimitedReader opened.  It's on its own so the reader's finalizer doesn't keep the reader alive."""
+    if file is not raw_file:
+        file.close()
+    if owns_file:
+        raw_file.close()
+
+
+class DelimitedReader(object):
+    """
+    Reads rows from a binary file, keeping track of the byte offset so it can checkpoint and resume.
+
+    For ledger files that keep getting appended to:
+
+        reader = DelimitedReader(path, checkpoint=saved)
+        for row in reader.rows(final=False):
+            ...
+        saved = reader.checkpoint()     # persist this (ex. json.dump(saved._asdict(), f))
+
+    Resuming from the checkpoint seeks straight to the offset, so a restart only costs the new data.
+
+    Compressed files (gzip, bz2, xz) are read directly.  They are decompressed in a background thread so that
+    decompression and parsing overlap.  For these, checkpoint offsets count decompressed bytes, and resuming has to
+    decompress (but not parse) everything before the offset.
+    """
+
+    def __init__(self, source, checkpoint=None, chunk_size=1 << 16, encoding='utf-8', compression='infer',
+                 prefetch=4, **parser_kwargs):
+        """
+        :param source: a path, or a file object opened in binary mode (must be seekable to resume a checkpoint)
+        :param checkpoint: a Checkpoint from a previous reader on the same file
+        :param chunk_size: number of bytes read at a time
+        :param encoding: encoding of the file
+        :param compression: 'gzip', 'bz2', 'xz', None for an uncompressed file, or 'infer' to check the magic bytes
+        :param prefetch: for compressed files, how many decompressed chunks may be waiting in the queue
+        Any extra keyword arguments are passed to RowParser.
+        """
+        self._owns_file = not hasattr(source, 'read')
+        self._file = open(source, 'rb') if self._owns_file else source
+        self._raw_file = self._file
+        if compression == 'infer':
+            compression = _sniff_compression(self._file)
+        if compression is not None:
+            self._file = COMPRESSION_OPENERS[compression](self._file)
+
+        self._chunk_size = chunk_size
+        self._encoding = encoding
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        # Encoding text with utf-8-sig, utf-16 or utf-32 puts a byte order mark in front.  checkpoint() takes it off.
+        self._bom_length = len(''.encode(encoding))
+        self._parser = RowParser(**parser_kwargs)
+
+        # The decoded chunk currently being parsed and how far into it we are
+        self._text = ""
+        self._pos = 0
+        # Bytes of the file read so far
+        self._read_offset = 0
+
+        if checkpoint is not None:
+            if checkpoint.offset:
+                self._read_bom()
+            self._file.seek(checkpoint.offset)
+            self._read_offset = checkpoint.offset
+            self._parser.restore(checkpoint.row, checkpoint.cell, checkpoint.in_quotes, checkpoint.quote_pending)
+
+        # Only start decompressing once we're at the right spot
+        if compression is not None:
+            self._file = BackgroundReader(self._file, chunk_size, prefetch)
+        # If the reader is dropped without being closed (ex. breaking out of "for row in DelimitedReader(path)"), this
+        # still stops the background thread and closes the file
+        self._finalizer = weakref.finalize(self, _close_files, self._file, self._raw_file, self._owns_file)
+
+    @property
+    def parser(self):
+        return self._parser
+
+    def _read_bom(self):
+        """
+        For resuming partway through a file in one of the BOM_ENCODINGS.  The decoder only learns the byte order from
+        the mark at the start of the file, so it's given the file's mark first, just as if it had read from the start.
+        """
+        marks = BOM_ENCODINGS.get(codecs.lookup(self._encoding).name, ())
+        if not marks:
+            return
+        self._file.seek(0)
+        start = self._file.read(max(len(mark) for mark in marks))
+        for mark in marks:
+            if start.startswith(mark):
+                self._decoder.decode(mark)
+                break
+
+    def _read_chunk(self):
+        """Reads and decodes the next chunk.  Returns False at the end of the file."""
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            return False
+        self._read_offset += len(chunk)
+        self._text = self._decoder.decode(chunk)
+        self._pos = 0
+        return True
+
+    def rows(self, final=True):
+        """
+        Yields every row available in the file right now.
+
+        :param final: if True, whatever is left at the end of the file counts as the last row.  Pass False when the
+            file is still being written to -- an unfinished last row will then wait (and be checkpointed) until the
+            rest of it shows up.
+        """
+        while True:
+            while self._pos < len(self._text):
+                found = []
+                self._pos = self._parser._parse(self._text, self._pos, found, one_row=True)
+                if found:
+                    yield found[0]
+            if not self._read_chunk():
+                break
+
+        if final:
+            yield from self._parser.feed(self._decoder.decode(b'', final=True))
+            yield from self._parser.close()
+
+    def __iter__(self):
+        return self.rows()
+
+    def checkpoint(self):
+        """
+        Where the reader is right now, as a Checkpoint.
+        The offset is worked out here rather than tracked per row, so reading rows stays just as fast.
+        """
+        # Don't count bytes that were read but not parsed yet: what's left of this chunk, and any partial character
+        # still sitting in the decoder.
+        unparsed = len(self._text[self._pos:].encode(self._encoding)) - self._bom_length
+        undecoded = len(self._decoder.getstate()[0])
+        offset = self._read_offset - unparsed - undecoded
+        return Checkpoint(offset, *self._parser.state())
+
+    def close(self):
+        # Only closes things the first time
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _decode_chunk(decoder, chunk):
+    """Chunks can be either bytes-like or already str"""
+    if isinstance(chunk, str):
+        return chunk
+    return decoder.decode(chunk)
+
+
+def iter_rows(stream, chunk_size=1 << 16, encoding='utf-8', **parser_kwargs):
+    """
+    Iterates over the converted rows of a file object, opened in either text or binary mode.
+    Any extra keyword arguments are passed to RowParser.
+    """
+    parser = RowParser(**parser_kwargs)
+    decoder = codecs.getincrementaldecoder(encoding)()
+
+    chunk = stream.read(chunk_size)
+    while chunk:
+        yield from parser.feed(_decode_chunk(decoder, chunk))
+        chunk = stream.read(chunk_size)
+
+    yield from parser.feed(decoder.decode(b'', final=True))
+    yield from parser.close()
+
+
+async def _aiter_chunks(source, chunk_size):
+    """Turns an asyncio.StreamReader (or anything with an async read) or an async iterable into chunks"""
+    if hasattr(source, 'read'):
+        chunk = await source.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = await source.read(chunk_size)
+        return
+
+    async for chunk in source:
+        yield chunk
+
+
+async def aiter_rows(source, chunk_size=1 << 16, batch_size=1000, encoding='utf-8', **parser_kwargs):
+    """
+    Async iterator over the converted rows of an asyncio stream.
+
+        async for row in aiter_rows(reader, delimiter=','):
+            ...
+
+    :param source: an asyncio.StreamReader, or an async iterable of bytes (or str) chunks.  Rows and multibyte
+        characters split across chunk boundaries are handled.
+    :param chunk_size: how many bytes to ask a StreamReader for at a time
+    :param batch_size: the most rows we will hand out before giving the event loop a turn.  Parsing never blocks the
+        loop for longer than one chunk plus this many rows.
+    :param encoding: used to decode bytes chunks
+    Any extra keyword arguments are passed to RowParser.
+
+    Since this is a generator, it's also naturally backpressured: the next chunk isn't read until the rows from the
+    previous one have been consumed.
+    """
+    parser = RowParser(**parser_kwargs)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    since_last_pause = 0
+
+    async for chunk in _aiter_chunks(source, chunk_size):
+        for row in parser.feed(_decode_chunk(decoder, chunk)):
+            yield row
+            since_last_pause += 1
+            if since_last_pause >= batch_size:
+                since_last_pause = 0
+                await asyncio.sleep(0)
+
+    for row in parser.feed(decoder.decode(b'', final=True)) + parser.close():
+        yield row
@@ -4,7 +4,79 @@ stated explicitly and the original source code, if used, must be available and c
 
 The MaybeNumber superclass.  Python version.
 """
+import collections
 import math
+import re
+import threading
+
+
+class ConversionCache(object):
+    """
+    A small bounded LRU cache for conversions, keyed by the raw cell text.
+
+    Spreadsheets repeat the same cells over and over ("0.00", "-", "N/A", "TRUE"...), and there's no reason to build a
+    whole MaybeNumber and run every bitmask again for text we have already converted.  Each entry stores the
+    converted value along with a type tag, which is whether or not the text was a number.
+
+    The cache is safe to share between threads.
+    """
+    __slots__ = ["_maxsize", "_data", "_lock", "hits", "misses", "evictions"]
+
+    def __init__(self, maxsize=1024):
+        """
+        :param maxsize: the largest number of entries kept.  Once full, the least recently used entry is evicted.
+        """
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1")
+        self._maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    def get(self, key, default=None):
+        """Returns the cached entry for key (and marks it as recently used), or default if it isn't cached"""
+        with self._lock:
+            try:
+                entry = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        """Adds an entry, evicting the least recently used one if the cache is full"""
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            if len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Empties the cache and resets the statistics"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Hit/miss statistics as a dictionary"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._data), 'maxsize': self._maxsize}
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
 
 
 class MaybeNumber(object):
@@ -18,6 +90,12 @@ class MaybeNumber(object):
     ALL_NUM_ELEMENTS = set(map(str, range(10))).union(IGNORE)
     ALL_NUM_ELEMENTS.add(".")
     ACCEPTABLE_ENDS = {' ', ')'}
+    # For extend_bytes: splits a buffer into runs of ASCII bytes and runs of everything else
+    _BYTE_RUNS = re.compile(rb'[\x00-\x7f]+|[\x80-\xff]+')
+    # For extend_bytes: the bytes that aren't digits or '.', so they can be deleted before building the number
+    _NOT_DIGIT_OR_DOT = bytes(byte for byte in range(256) if not (48 <= byte < 58 or byte == 46))
+    # For extend_bytes: (class, token) -> {bitmask name: translate table mapping each byte to b'0' or b'1'}
+    _BYTE_BIT_TABLES = {}
 
 
     # This is the default bitmask names.  I'll shove them up here so people can tell what to they want to
@@ -196,6 +274,7 @@ class MaybeNumber(object):
                 mask = getattr(self, f"_{attr_name}")
                 final.append((f"_{attr_name}", mask & 1))
                 setattr(self, f"_{attr_name}", mask >> 1)
+            self._len_bitmasks -= 1
             return final
 
         # I iterate over self._bitmask_names() on purpose here because I feel that the order in which the bits are set
@@ -288,6 +367,117 @@ class MaybeNumber(object):
         for letter in str(phrase):
             self.append(letter)
 
+    def extend_bytes(self, buf, start=0, stop=None, encoding='utf-8'):
+        """
+        Same as extend, but for bytes-like objects (bytes, bytearray, memoryview, mmap...).  The buffer is read where
+        it is instead of being decoded and copied as a whole.
+
+        Runs of ASCII bytes are classified a run at a time: each bitmask gets all of the run's bits at once from a byte
+        table (see _byte_bit_tables), and the digits go straight into the number.  Only the text itself is still kept
+        as a str, since pop() and convert() need it.  Anything else (non-ASCII bytes, or a subclass that does its own
+        thing in append) is decoded a run at a time and appended letter by letter.
+
+        :param buf: any object supporting the buffer protocol
+        :param start: index of the first byte to add
+        :param stop: index to stop at (exclusive).  Default is the end of the buffer.
+        :param encoding: the encoding used for non-ASCII bytes.  It has to leave ASCII bytes as ASCII (ex. UTF-8,
+            Latin-1 or cp1252).
+        """
+        view = memoryview(buf)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        view = view[start:stop]
+
+        by_table = self._classifies_bytes()
+        for run in self._BYTE_RUNS.findall(view):
+            if run[0] >= 128:
+                # Raises if a multibyte character is cut off by start or stop
+                self.extend(str(run, encoding))
+                continue
+            # Mostly comes up in C++ code.  append skips these too.
+            run = run.replace(b'\0', b'')
+            if not run:
+                continue
+            if by_table:
+                self._extend_ascii(run)
+            else:
+                self.extend(run.decode('ascii'))
+
+    def _classifies_bytes(self):
+        """Whether extend_bytes can use the byte tables, meaning nothing that append relies on has been overridden"""
+        cls = type(self)
+        return (cls.append is MaybeNumber.append and cls._get_additive_functions is MaybeNumber._get_additive_functions
+                and cls._adjust_bits is MaybeNumber._adjust_bits and cls._add_bits is MaybeNumber._add_bits)
+
+    def _byte_bit_tables(self):
+        """
+        For each bitmask, a bytes.translate table that turns every ASCII byte into b'1' if append would set its bit for
+        that letter, or b'0' if it wouldn't.  So int(run.translate(table), 2) is the bits for a whole run.
+
+        isacceptablestart also depends on the letters before it, so its table only says whether the letter can start a
+        number (see _extend_ascii).  The tables only depend on the class and the token, so they are only made once.
+        """
+        key = (type(self), self._token)
+        tables = self._BYTE_BIT_TABLES.get(key)
+        if tables is None:
+            letters = [chr(byte) for byte in range(128)]
+            tables = {}
+            for name, bit_func in self._bitmask_additive_functions.items():
+                if name == 'isacceptablestart':
+                    bit_func = lambda letter: letter == ' ' or letter in self.CURRENCIES
+                tables[name] = bytes(49 if bit_func(letter) else 48 for letter in letters) + b'0' * 128
+            self._BYTE_BIT_TABLES[key] = tables
+        return tables
+
+    def _extend_ascii(self, run):
+        """Does what append does for every letter in run (ASCII bytes, no zeros), but a whole bitmask at a time"""
+        tables = self._byte_bit_tables()
+        length = len(run)
+        # Whether there has been a '.' before this run.  I need it for the number below, before isdot gets updated.
+        seen_dot = self._the_bitmasks.get('isdot', 0) != 0
+
+        for name, mask in self._the_bitmasks.items():
+            if name not in tables:
+                continue
+            if name == 'isacceptablestart':
+                # Bits are only set for the spaces and currency symbols at the very start of the string
+                bits = 0
+                if mask == (1 << self._len_bitmasks) - 1:
+                    leading = run.translate(tables[name]).find(b'0')
+                    if leading == -1:
+                        leading = length
+                    bits = ((1 << leading) - 1) << (length - leading)
+            else:
+                bits = int(run.translate(tables[name]), 2)
+            self._the_bitmasks[name] = (mask << length) | bits
+        self._len_bitmasks += length
+
+        for _ in range(run.count(b'(') + run.count(b'-')):
+            self._multiplier *= -1.0
+        for _ in range(run.count(b'%')):
+            self._multiplier *= 0.01
+        self._original += run.decode('ascii')
+
+        # The same number building as append, with byte - 48 as the digit
+        number, place = self._forcenumber, self._place
+        for byte in run.translate(None, self._NOT_DIGIT_OR_DOT):
+            if byte == 46:
+                seen_dot = True
+                place = 0.1
+            elif seen_dot:
+                number += (byte - 48) * place
+                place /= 10.0
+            else:
+                number = (number * 10.0) + (byte - 48)
+        self._forcenumber, self._place = number, place
+
+    @classmethod
+    def from_bytes(cls, buf, start=0, stop=None, tokenize_by=' ', encoding='utf-8'):
+        """Creates a new MaybeNumber from a slice of a bytes-like object.  See extend_bytes."""
+        maybe = cls("", tokenize_by)
+        maybe.extend_bytes(buf, start, stop, encoding)
+        return maybe
+
     def pop(self, masked=False):
         """
         Pops the final item in the string.
@@ -364,6 +554,42 @@ class MaybeNumber(object):
         except ValueError:
             return additional_function(self)
 
+    @classmethod
+    def convert_many(cls, cells, cache=None, types=False, tokenize_by=' '):
+        """
+        Converts an entire column (or row) of cells in one go.
+
+        :param cells: iterable of strings.  Each one is converted the same way convert() would do it.
+        :param cache: None for no caching, an int for a new ConversionCache of that size, or a ConversionCache you
+            already have (so you can share it between calls and look at its stats afterwards).
+        :param types: if True, each item in the returned list is (value, isnumber) instead of just the value.
+        :param tokenize_by: passed through to each MaybeNumber
+        :return: a list of the converted values
+        """
+        if isinstance(cache, int) and not isinstance(cache, bool):
+            cache = ConversionCache(cache)
+
+        converted = []
+        for cell in cells:
+            entry = cls._convert_cell(cell, cache, tokenize_by)
+            converted.append(entry if types else entry[0])
+        return converted
+
+    @classmethod
+    def _convert_cell(cls, cell, cache=None, tokenize_by=' '):
+        """Converts a single cell to (value, isnumber), going through the cache first if there is one"""
+        if cache is not None:
+            entry = cache.get(cell)
+            if entry is not None:
+                return entry
+
+        maybe = cls(cell, tokenize_by)
+        entry = (maybe.convert(), maybe.isnumber())
+
+        if cache is not None:
+            cache.put(cell, entry)
+        return entry
+
 
     def force_to_number(self):
         """
@@ -384,8 +610,11 @@ class MaybeNumber(object):
         Performs the final step to turn self._forcenumber into the number we expect it to be.
         In other words, this multiplies self._forcenumber by the multiplier and checks to see what numeric type it is
         """
-        forced_item = self._forcenumber * self._multiplier
+        return self._numeric_type(self._forcenumber * self._multiplier)
 
+    @staticmethod
+    def _numeric_type(forced_item):
+        """Returns forced_item as an int if it's a whole number, otherwise leaves it as a float"""
         if forced_item == int(float(forced_item)):
             return int(forced_item)
         return forced_item
@@ -446,6 +675,89 @@ class MaybeNumber(object):
         return True
 
 
+    # The same thing, but for a slice of the string.  These are for tokenizing: they let us check whether each token
+    # is a number using the bitmasks we already have, instead of creating a new MaybeNumber for every token.
+
+
+    def _bits_between(self, bitmask, start, stop):
+        """Returns only the bits of bitmask that belong to self.unwrapped[start:stop]"""
+        return (bitmask >> (len(self._original) - stop)) & ((1 << (stop - start)) - 1)
+
+    def _isnumber_between(self, start, stop):
+        """
+        Same as type(self)(self.unwrapped[start:stop]).isnumber(), but done with slices of this object's bitmasks.
+        The checks are the same as in isnumber() -- see the comments there.
+        """
+        if start >= stop:
+            return False
+        between = self._bits_between
+        if between(self._isnumberelement, start, stop) == 0 or between(self._isdigit, start, stop) == 0:
+            return False
+        if between(self._isdefnotnumber, start, stop) != 0:
+            return False
+
+        cannot_be_doubled = ['isdot', 'isdash', 'iscurrency', 'ispercent', 'isopenparen', 'isclosedparen']
+        for attr_name in cannot_be_doubled:
+            bitmask = between(getattr(self, f"_{attr_name}"), start, stop)
+            if bitmask > 0 and not self._is_only_one_bit_on(bitmask):
+                return False
+
+        isdash = between(self._isdash, start, stop)
+        isopenparen = between(self._isopenparen, start, stop)
+        isclosedparen = between(self._isclosedparen, start, stop)
+        if isdash and isopenparen:
+            return False
+        if isdash and isclosedparen:
+            return False
+        if isopenparen and not isclosedparen:
+            return False
+
+        # Negative (there can only be one '-' or '(' by now).  isacceptablestart only works from the start of the
+        # whole string, so skip over the acceptable starting characters by hand.  There are only ever a few.
+        if isdash or isopenparen:
+            first = start
+            while self._original[first] == ' ' or self._original[first] in self.CURRENCIES:
+                first += 1
+            if self._original[first] != ('-' if isdash else '('):
+                return False
+
+        if between(self._ispercent, start, stop):
+            last = stop - 1
+            while self._original[last].isspace():
+                last -= 1
+            if self._original[last] == ')':
+                last -= 1
+            if last < start or self._original[last] != '%':
+                return False
+        return True
+
+    def _number_between(self, start, stop):
+        """
+        Same as type(self)(self.unwrapped[start:stop]).force_to_number(), without creating the new object.
+        The arithmetic is the same as in append().
+        """
+        multiplier = 1
+        forcenumber = 0
+        place = 1
+        seen_dot = False
+        for i in range(start, stop):
+            letter = self._original[i]
+            if letter == '(' or letter == '-':
+                multiplier *= -1.0
+            if letter == '%':
+                multiplier *= 0.01
+            if letter == '.':
+                place = 0.1
+                seen_dot = True
+            elif letter in self.ALL_NUM_ELEMENTS and letter not in self.IGNORE:
+                if seen_dot:
+                    forcenumber += (float(letter) * place)
+                    place /= 10.0
+                else:
+                    forcenumber = (forcenumber * 10.0) + float(letter)
+        return self._numeric_type(forcenumber * multiplier)
+
+
     ##########################################################################################
     # The methods below are for another useful thing the class can do -- it can slice a string
     # with a much shorter average time than normal.
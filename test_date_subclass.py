@@ -0,0 +1,120 @@
+"""
+Tests for date_subclass.py.  Run with:  python -m pytest
+
+These pin what CheckDate finds on a few representative inputs, so the incremental date detection (the flag masks in
+_date_items, the three-number candidates in numeric_starts, and the DigitClusters table) can be checked after any
+change to it.
+"""
+import datetime
+
+import pytest
+
+from date_subclass import CheckDate
+
+
+def _date_masks(maybe):
+    items = maybe._date_items
+    return tuple(items[name] for name in ('is_over_12', 'is_over_31', 'is_zero', 'is_four_digits', 'date_bitlength'))
+
+
+def _dates(maybe):
+    """convert_date, but always a list, and empty when there's no date"""
+    try:
+        dates = maybe.convert_date()
+    except ValueError:
+        return []
+    return dates if isinstance(dates, list) else [dates]
+
+
+def _clusters(maybe):
+    clusters = maybe._date_items['clusters']
+    return clusters.starts, clusters.stops, clusters.values, clusters.years
+
+
+def _state(maybe):
+    """Everything append and pop keep up to date for date detection"""
+    return (maybe.unwrapped, _date_masks(maybe), dict(maybe._date_items['numeric_starts']), _clusters(maybe),
+            maybe.isdate())
+
+
+D = datetime.date
+
+# text, isdate, (is_over_12, is_over_31, is_zero, is_four_digits, date_bitlength), three-number candidates, dates
+NUMERIC_DATES = [
+    ('12/15/2001', True, (3, 1, 0, 1, 3), [0], [D(2001, 12, 15)]),
+    ('1.1.2020', True, (1, 1, 0, 1, 3), [0], [D(2020, 1, 1)]),
+    ('1-1-2020', True, (1, 1, 0, 1, 3), [0], [D(2020, 1, 1)]),
+    ('1 1 2020', True, (1, 1, 0, 1, 3), [0], [D(2020, 1, 1)]),
+    ('2020-12-15', True, (5, 4, 0, 4, 3), [0], [D(2020, 12, 15)]),
+    ('31/12/2020', True, (5, 1, 0, 1, 3), [0], [D(2020, 12, 31)]),
+    ('00/12/2020', False, (1, 1, 4, 1, 3), [], []),
+    ('13/13/2020', False, (7, 1, 0, 1, 3), [], []),
+    ('paid 1/2/2003 and 4/5/2006', True, (9, 9, 0, 9, 6), [3, 0], [D(2006, 4, 5), D(2003, 1, 2)]),
+    ('on 12/15/01', False, (2, 0, 0, 0, 3), [], []),
+    ('12/15/2001 12/16/2001', True, (27, 9, 0, 9, 6), [3, 0, 2], [D(2001, 12, 16), D(2001, 12, 15), D(2001, 12, 16)]),
+    ('2001/12/15/2002', True, (11, 9, 0, 9, 4), [1, 0], [D(2002, 12, 15), D(2001, 12, 15)]),
+    ('no dates 12345', False, (1, 1, 0, 0, 1), [], []),
+]
+
+
+@pytest.mark.parametrize('text, isdate, masks, candidates, dates', NUMERIC_DATES)
+def test_numeric_dates(text, isdate, masks, candidates, dates):
+    maybe = CheckDate(text)
+    assert maybe.isdate() is isdate
+    assert _date_masks(maybe) == masks
+    assert maybe._find_three_numbers_in_pattern() == candidates
+    assert _dates(maybe) == dates
+
+
+# text, dates.  The month name is found around the nearest four-digit year.
+MONTH_NAME_DATES = [
+    ('Dec. 31st, 2020', [D(2020, 12, 31)]),
+    ('the 13th day of November in the year 2020', [D(2020, 11, 13)]),
+    ('March 5 2020', [D(2020, 3, 5)]),
+    ('5 March 2020', [D(2020, 3, 5)]),
+    ('2020, 5 March', [D(2020, 3, 5)]),
+    ('2020 March 5', [D(2020, 3, 5)]),
+    # A year right next to its month used to raise IndexError
+    ('5 Dec2020', [D(2020, 12, 5)]),
+    ('Dec2020 5', []),
+    # Day, year, then month isn't a date (see Known issues in date_subclass.py).  Before DigitClusters, it was when the
+    # day was a single digit, but never with two digits.
+    ('5 2020 March', []),
+    ('15 2020 March', []),
+    ('the 5th, 2020 in March', []),
+    ('$Jan3x2020 May', []),
+]
+
+
+@pytest.mark.parametrize('text, dates', MONTH_NAME_DATES)
+def test_month_name_dates(text, dates):
+    maybe = CheckDate(text)
+    assert maybe.isdate() is bool(dates)
+    assert _dates(maybe) == dates
+
+
+@pytest.mark.parametrize('text, clusters', [
+    ('on 05/12/2020 x', ([3, 6, 9], [5, 8, 13], [5, 12, 2020], [2])),
+    ('Dec2020 5', ([3, 8], [7, None], [2020, 5], [0])),
+    ('a1 22 333 4444 55555', ([1, 3, 6, 10, 15], [2, 5, 9, 14, None], [1, 22, 333, 4444, 55555], [3])),
+])
+def test_digit_clusters(text, clusters):
+    assert _clusters(CheckDate(text)) == clusters
+
+
+def test_popping_a_leading_zero_cluster():
+    # "05" is still a cluster after the 5 is popped, even though its number is 0
+    maybe = CheckDate('on 05')
+    maybe.pop()
+    assert _clusters(maybe) == ([3], [None], [0], [])
+    maybe.pop()
+    assert _clusters(maybe) == ([], [], [], [])
+
+
+@pytest.mark.parametrize('text', [row[0] for row in NUMERIC_DATES + MONTH_NAME_DATES] + ['on 05/12/2020 x'])
+def test_pop_undoes_append(text):
+    # Popping back to any length leaves the same state as building that much from scratch
+    maybe = CheckDate(text)
+    for length in range(len(text) - 1, -1, -1):
+        maybe.pop()
+        assert _state(maybe) == _state(CheckDate(text[:length])), text[:length]
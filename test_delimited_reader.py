@@ -0,0 +1,38 @@
+"""
+Tests for delimited_reader.py.  Run with:  python -m pytest
+"""
+import io
+
+import pytest
+
+from delimited_reader import DelimitedReader
+
+
+ROWS_TEXT = 'a,b\n1,2\nxé,3\n4,5'
+ROWS = [['a', 'b'], [1, 2], ['xé', 3], [4, 5]]
+
+
+def _resume_after(data, encoding, count, chunk_size):
+    """Reads count rows, checkpoints, and resumes from the checkpoint with a new reader"""
+    reader = DelimitedReader(io.BytesIO(data), encoding=encoding, chunk_size=chunk_size)
+    rows = reader.rows(final=False)
+    read = [next(rows) for _ in range(count)]
+    checkpoint = reader.checkpoint()
+    resumed = DelimitedReader(io.BytesIO(data), checkpoint=checkpoint, encoding=encoding, chunk_size=chunk_size)
+    return read + list(resumed)
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-8-sig', 'utf-16', 'utf-32', 'latin-1'])
+@pytest.mark.parametrize('chunk_size', [1, 3, 64])
+def test_resume_from_checkpoint(encoding, chunk_size):
+    data = ROWS_TEXT.encode(encoding)
+    # The last row is held back with final=False, so checkpoint after each of the others
+    for count in range(len(ROWS)):
+        assert _resume_after(data, encoding, count, chunk_size) == ROWS
+
+
+def test_utf_8_sig_checkpoint_leaves_out_the_bom():
+    reader = DelimitedReader(io.BytesIO('a,b\n1,2'.encode('utf-8-sig')), encoding='utf-8-sig')
+    assert next(reader.rows(final=False)) == ['a', 'b']
+    # 3 bytes for the BOM and 4 for "a,b\n"
+    assert reader.checkpoint().offset == 7
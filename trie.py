@@ -1,10 +1,23 @@
 
 
+import array
+import bisect
+import json
+import mmap as memory_map
+import os
+import struct
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+
 class Node(object):
     MAX_CHARS = 256
+    __slots__ = ('next', 'value')
 
     def __init__(self):
         self.next = {}
+        # Whatever was stored with the word.  Only set on the '\0' node at the end of a word.
+        self.value = None
 
     def insert(self, letter):
         return self.next.setdefault(letter, Node())
@@ -16,60 +29,193 @@ class Node(object):
 
 
 class Trie(object):
+    APOSTROPHES = ("'", "’")
+    # Suffix rules for lookup, as {lowercase suffix: what to try in its place}.  A word that isn't in the trie is still
+    # found if it ends in one of these and what comes before the suffix, plus one of the replacements, is a word.
+    SUFFIX_RULES = {'ies': ('y',), 'iest': ('y',), 's': ('',), 'ed': ('ing',), 'ing': ('ed',), "'": ('',), "’": ('',)}
+    # The suffix lengths lookup checks, longest first
+    _SUFFIX_LENGTHS = sorted({len(suffix) for suffix in SUFFIX_RULES}, reverse=True)
+
+    def __init_subclass__(cls, **kwargs):
+        # In case the subclass has its own SUFFIX_RULES
+        super().__init_subclass__(**kwargs)
+        cls._SUFFIX_LENGTHS = sorted({len(suffix) for suffix in cls.SUFFIX_RULES}, reverse=True)
 
     def __init__(self):
         self._root = Node()
-        # Last node looked up
-        self._last_node = None
+        # Once frozen, nothing else can be inserted.  This is so one trie can be shared by lots of objects.
+        self._frozen = False
 
     def __contains__(self, item):
         return self.lookup(item, endword='\0')
         # return self._more_intelligent_lookup(item)
 
-    def _cache(self, node):
-        self._last_node = node
-        return node
+    def freeze(self):
+        """Makes the trie read-only.  Any further inserts will raise a TypeError."""
+        self._frozen = True
+        return self
 
-    def insert(self, a_string):
+    @property
+    def frozen(self):
+        return self._frozen
+
+    @classmethod
+    def from_sorted(cls, words):
+        """
+        Builds a trie from words sorted by their lowercase form.  Each item may also be a (word, value) pair.
+        Words that end the same way share the same nodes for their endings (-ing, -ed, -ies...), so what comes back
+        is a minimal word graph rather than a tree.  Since nodes are shared, it comes back frozen.
+
+        Works in one pass (Daciuk et al.): once a word is added, the nodes the next word doesn't need are finished,
+        so each one is swapped for an identical node already seen, if there is one.
+        Values have to be hashable.
+        """
+        trie = cls()
+        # Finished nodes, by (value, letters and the nodes they go to)
+        register = {}
+        # The (parent, letter, child) edges for the last word whose nodes aren't finished yet
+        unchecked = []
+
+        def minimize(down_to):
+            while len(unchecked) > down_to:
+                parent, letter, child = unchecked.pop()
+                # Words come in sorted, so the letters in child.next are already in order
+                signature = (child.value, tuple(child.next), tuple(map(id, child.next.values())))
+                same = register.setdefault(signature, child)
+                if same is not child:
+                    parent.next[letter] = same
+
+        previous = ""
+        for item in words:
+            word, value = item if isinstance(item, tuple) else (item, None)
+            key = word.lower() + '\0'
+            if key < previous:
+                raise ValueError(f"Words must be sorted: {word!r} came after {previous[:-1]!r}")
+            if key == previous:
+                continue
+
+            common = 0
+            for a, b in zip(key, previous):
+                if a != b:
+                    break
+                common += 1
+            minimize(common)
+
+            node = unchecked[-1][2] if unchecked else trie._root
+            for letter in key[common:]:
+                child = Node()
+                node.next[letter] = child
+                unchecked.append((node, letter, child))
+                node = child
+            node.value = value
+            previous = key
+
+        minimize(0)
+        return trie.freeze()
+
+    def save(self, path):
+        """Saves the trie to a file for Trie.load.  The file format is described in FrozenTrie.to_bytes."""
+        FrozenTrie.from_trie(self).save(path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a trie saved with save().  It always comes back as a FrozenTrie.
+        With mmap, the file is mapped and used where it is rather than read in, so loading takes a few milliseconds
+        however big the trie is, and every process that loads the same file shares the same pages in memory.
+        """
+        with open(path, 'rb') as file:
+            if mmap:
+                buffer = memory_map.mmap(file.fileno(), 0, access=memory_map.ACCESS_READ)
+            else:
+                buffer = file.read()
+        return FrozenTrie.from_buffer(buffer)
+
+    def _check_not_frozen(self):
+        if self._frozen:
+            raise TypeError("Cannot insert into a frozen Trie")
+
+    def insert(self, a_string, value=None):
+        """Inserts a word.  If value is given, it's stored with the word and get() will return it."""
+        self._check_not_frozen()
         node = self._root
         for letter in a_string + "\0":
-            node = self._cache(node.insert(letter.lower()))
+            node = node.insert(letter.lower())
+        if value is not None:
+            node.value = value
 
     def insert_prefix(self, prefix):
+        self._check_not_frozen()
         node = self._root
         for letter in prefix:
-            node = self._cache(node.insert(letter.lower()))
+            node = node.insert(letter.lower())
         return node
 
-    def is_wordstart(self, a_string):
+    def _child(self, node, letter):
+        """The node after node for letter, or None.  Everything that walks the trie goes through here."""
+        return node.next.get(letter)
+
+    def _value(self, node):
+        """The value stored at node"""
+        return node.value
+
+    def _children(self, node):
+        """(letter, child) for every edge out of node, sorted by letter"""
+        return sorted(node.next.items())
+
+    def get(self, word, default=None):
+        """Returns the value stored with the word, or default if the word isn't in the trie or has no value"""
+        node = self._root
+        for letter in word.lower() + '\0':
+            node = self._child(node, letter)
+            if node is None:
+                return default
+        value = self._value(node)
+        return default if value is None else value
+
+    def is_wordstart(self, a_string, cursor=None):
         """Returns whether or not the current string is the start of a word"""
-        try:
-            self._traverse(a_string, ending="")
-            return True
-        except KeyError:
-            return False
+        nodes = self._walk(a_string)
+        self._place_cursor(cursor, nodes, len(a_string))
+        return len(nodes) == len(a_string)
 
     @property
     def root(self):
         return self._root
 
+    def cursor(self):
+        """A TrieCursor at the root, for walking the trie one letter at a time"""
+        return TrieCursor(self)
+
+    def _walk(self, a_string):
+        """
+        Returns the nodes for each letter of a_string, stopping at the first letter that isn't in the trie.
+        Everything is lowercased when it's inserted, so each letter is lowercased once and there's only one edge to try.
+        """
+        nodes = []
+        node = self._root
+        for letter in a_string:
+            node = self._child(node, letter.lower())
+            if node is None:
+                break
+            nodes.append(node)
+        return nodes
+
+    def _place_cursor(self, cursor, nodes, length):
+        """
+        Leaves cursor (if there is one) at the end of the longest start of the word that's in the trie.
+        nodes are from _walk, and length is the length of the word without any ending.
+        """
+        if cursor is not None:
+            cursor.restore(nodes[min(len(nodes), length) - 1] if nodes and length else self._root)
+
     def _iter_word(self, a_string, ending='\0'):
         """Iterates through the word.  Will raise a KeyError if the word is not in the tree"""
         node = self._root
-        so_far = ""
-        for letter in a_string + ending:
-            is_letter = False
-            for letter_variant in [letter.upper(), letter.lower()]:
-                try:
-                    node = self._cache(node.next[letter_variant])
-                    so_far += letter_variant
-                    is_letter = True
-                    break
-                except KeyError:
-                    pass
-            if not is_letter:
-                raise KeyError(f"{letter} not found after {so_far}")
-
+        for i, letter in enumerate(a_string + ending):
+            node = self._child(node, letter.lower())
+            if node is None:
+                raise KeyError(f"{letter} not found after {a_string[:i]}")
             yield node
 
     def _traverse(self, a_string, ending='\0'):
@@ -77,15 +223,24 @@ class Trie(object):
         prev = None
         prev_to_prev = None
         for node in self._iter_word(a_string, ending):
-            prev_to_prev = self._cache(prev)
+            prev_to_prev = prev
             prev = node
 
         return prev_to_prev
 
-    def lookup(self, word, so_far=None, nodes=None, endword='\0'):
-        """Returns true if the word is in here, false if it's not"""
+    def lookup(self, word, so_far=None, nodes=None, endword='\0', cursor=None):
+        """
+        Returns true if the word is in here, false if it's not.
+        If cursor (a TrieCursor) is given, it's left at the end of the longest start of the word that's in the trie.
+        Lookups never change the trie, so one trie can be shared by any number of threads.  To find out where a lookup
+        ended (see is_last_lookup_complete), pass it your own TrieCursor.
+        """
         # if len(word) == 1 and word[0] == "'" or word[0] == "’":
         #     return False
+        if cursor is not None:
+            if so_far is None and nodes is None:
+                so_far, nodes = self._get_list_for_lookup(word, end_of_word=endword)
+            self._place_cursor(cursor, nodes, len(word))
         return self._more_intelligent_lookup(word=word, so_far=so_far, nodes=nodes, end_word=endword)
         # try:
         #     return "\0" in self._traverse(word).next
@@ -93,146 +248,492 @@ class Trie(object):
         #     return False
 
 
+    def lookup_many(self, words, endword='\0'):
+        """
+        Same as [self.lookup(word) for word in words], but each word only walks the trie from where it stops sharing a
+        start with the word before it.  Sorting the words first makes that happen as often as possible.
+        """
+        results = []
+        previous = ""
+        # The nodes for previous, as far as it got in the trie
+        path = []
+        for word in words:
+            wordi = word + endword
+            common = 0
+            for a, b in zip(wordi, previous):
+                if a != b:
+                    break
+                common += 1
+
+            if len(path) > common:
+                del path[common:]
+            # If previous stopped before the end of what they share, this word stops in the same place
+            if len(path) == common:
+                node = path[-1] if path else self._root
+                for letter in wordi[common:]:
+                    node = self._child(node, letter.lower())
+                    if node is None:
+                        break
+                    path.append(node)
+
+            # A word that's in the trie as it is doesn't need the suffix rules
+            if endword == '\0' and len(path) == len(wordi):
+                results.append(True)
+            else:
+                results.append(self._more_intelligent_lookup(word, wordi[:len(path)], path, endword))
+            previous = wordi
+        return results
+
+    def startswith(self, prefix, limit=None):
+        """Returns the words in the trie (lowercased) that start with prefix, in order.  Stops after limit words."""
+        start = self._walk(prefix)
+        if len(start) != len(prefix):
+            return []
+
+        words = []
+        prefix = prefix.lower()
+        # Depth first, with the smallest letter on top of the stack so the words come out sorted
+        stack = [(start[-1] if start else self._root, prefix)]
+        while stack and (limit is None or len(words) < limit):
+            node, so_far = stack.pop()
+            for letter, child in reversed(self._children(node)):
+                if letter == '\0':
+                    words.append(so_far)
+                else:
+                    stack.append((child, so_far + letter))
+        return words[:limit]
+
+    def fuzzy_lookup(self, word, max_distance=1):
+        """
+        Returns (word in the trie, edit distance) for every word within max_distance edits (Levenshtein) of word,
+        closest first.  Good for misspellings like "Febuary".
+
+        Each node keeps the row of the edit distance table for the letters leading to it, so a whole branch is skipped
+        as soon as every number in its row is over max_distance.
+        """
+        word = word.lower()
+        matches = []
+        stack = [(self._root, "", list(range(len(word) + 1)))]
+        while stack:
+            node, so_far, row = stack.pop()
+            for letter, child in self._children(node):
+                if letter == '\0':
+                    if row[-1] <= max_distance:
+                        matches.append((so_far, row[-1]))
+                    continue
+
+                new_row = [row[0] + 1]
+                for i, char in enumerate(word, 1):
+                    new_row.append(min(new_row[i - 1] + 1, row[i] + 1, row[i - 1] + (char != letter)))
+                if min(new_row) <= max_distance:
+                    stack.append((child, so_far + letter, new_row))
+
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
     def _get_list_for_lookup(self, word, end_of_word='\0'):
         """Gets the nodes as a list rather than a single node so I can pop off the back and stem the word"""
-        iterator = self._iter_word(word, ending=end_of_word)
-        so_far = ""
         wordi = word + end_of_word
-        nodes = []
-
-        i = 0
-        while i < len(wordi):
-            try:
-                nodes.append(self._cache(next(iterator)))
-                so_far += wordi[i]
-                i += 1
-            except KeyError:
-                break
-        return so_far, nodes
+        nodes = self._walk(wordi)
+        return wordi[:len(nodes)], nodes
 
     def _more_intelligent_lookup(self, word, so_far=None, nodes=None, end_word='\0'):
-        """Does a more intelligent lookup dealing with suffixes"""
+        """
+        Does a more intelligent lookup dealing with suffixes.  The word is only walked once: if it isn't in the trie as
+        it is, each suffix rule that fits it (see SUFFIX_RULES) is tried from the node where its stem ends.
+        """
         if so_far is None and nodes is None:
             so_far, nodes = self._get_list_for_lookup(word, end_of_word=end_word)
 
         if end_word == '\0' and so_far.endswith('\0'):
             return True
 
-        if word.endswith('iest') or word.endswith('ies'):
-            i = -4
-            mystr = 'ies'
-            while mystr:
-                if so_far.endswith(mystr):
-                    break
-                mystr = mystr[:-1]
-                i += 1
-
-            node = nodes[i]
-            # Check for '-ies' instead of y or 'iest' instead of 'y'
-            if self._is_ending(node, 'y', end_word):
-                return True
-
-        # If there's an s on the end
-        if word.endswith('s') and so_far == word[:-1]:
+        # A lone apostrophe counts as a word
+        if word in self.APOSTROPHES:
             return True
 
-        # If it's a verb and it ends differently
-        if word.endswith('ed'):
-            node = nodes[-1]
-            if so_far.endswith('e'):
-                node = nodes[-2]
+        ending = word[-self._SUFFIX_LENGTHS[0]:].lower()
+        for length in self._SUFFIX_LENGTHS:
+            if len(word) > length:
+                for replacement in self.SUFFIX_RULES.get(ending[-length:], ()):
+                    if self._is_stem(nodes, len(word) - length, replacement, end_word):
+                        return True
 
-            if self._is_ending(node, 'ing', end_word):
-                return True
-
-        if word.endswith('ing'):
-            i = -3
-            mystr = 'in'
-            while mystr:
-                if so_far.endswith(mystr):
-                    break
-                mystr = mystr[:-1]
-                i += 1
-
-            node = nodes[i]
-            if self._is_ending(node, 'ed', end_word):
-                return True
-
-        # Ends with an apostrophe -- ignore the apostrophe
-        if word.endswith("'") or word.endswith("’"):
-            if len(word) == 1:
-                return True
-            if self._is_ending(nodes[-1], '', end_word):
+        # If there's an apostrophe in the middle, it's a word if the part before it is (ex. it's).
+        # For n't, the part before the n counts too (ex. don't).
+        if "'" not in word and "’" not in word:
+            return False
+        where = min(word.find(apostrophe) for apostrophe in self.APOSTROPHES if apostrophe in word)
+        if where > 0:
+            if self._is_stem(nodes, where, '', end_word):
                 return True
-
-
-        # If there's an apostrophe
-        if "'" in word or "’" in word:
-            subword, i = self.get_apostrophe_subword(word, so_far)
-            if self._is_ending(nodes[i], '', end_word):
+            if word[where - 1] in 'nN' and self._is_stem(nodes, where - 1, '', end_word):
                 return True
 
-
-        # stemmed = self._stemmer.stem(word)
-        # print(f"{stemmed=}")
         return False
 
+    def _is_stem(self, nodes, length, replacement, end_word='\0'):
+        """Whether the first length letters of the word walked into nodes, followed by replacement, are a word"""
+        if length == 0 or len(nodes) < length:
+            return False
+        return self._is_ending(nodes[length - 1], replacement, end_word)
+
     def _is_ending(self, node, suffix, endword='\0'):
         mynode = node
         for letter in suffix + endword:
-            try:
-                mynode = mynode.next[letter.lower()]
-            except KeyError:
+            mynode = self._child(mynode, letter.lower())
+            if mynode is None:
                 return False
         return True
 
-    @staticmethod
-    def get_apostrophe_subword(word, so_far):
-        if word.endswith("'") or word.endswith("’"):
-            return word[:-1], -1
-
-        # If there's an apostrophe
-        if "'" in word or "’" in word:
-            apostr = "'" if "'" in word else "’"
-            where_is = list(word).index(apostr)
-            non_apostr = word[:where_is]
-            if non_apostr.endswith("n"):
-                non_apostr = non_apostr[:-1]
-
-            mystr = so_far
-            i = -1
-            while mystr != non_apostr:
-                mystr = mystr[:-1]
-                i -= 1
-
-            return non_apostr, i
-        return so_far, -1
-
-
-    def find_part(self, word):
+    def find_part(self, word, cursor=None):
         """Returns the largest part of the word that exists in the trie"""
-        iterator = self._iter_word(word)
-        so_far = ""
         wordi = word + '\0'
-        node = self._root
+        nodes = self._walk(wordi)
+        self._place_cursor(cursor, nodes, len(word))
+        return wordi[:len(nodes)], (nodes[-1] if nodes else self._root)
 
-        i = 0
-        while i < len(wordi):
-            try:
-                node = self._cache(next(iterator))
-                so_far += wordi[i]
-                i += 1
-            except KeyError:
-                return so_far, node
-        return so_far, node
-
-    def insert_from_node(self, rest_of_word, node):
+    def insert_from_node(self, rest_of_word, node, value=None):
         """Inserts remainder of word starting from node.  This is my attempt to try to get this to load faster"""
+        self._check_not_frozen()
         mynode = node
         for letter in rest_of_word + '\0':
             mynode = mynode.insert(letter.lower())
+        if value is not None:
+            mynode.value = value
+
+    def is_last_lookup_complete(self, cursor):
+        """
+        Checks if a lookup ended on a complete word.  cursor is the TrieCursor that was passed to the lookup.
+            cursor = trie.cursor()
+            trie.find_part("Decxyz", cursor=cursor)
+            trie.is_last_lookup_complete(cursor)  # True, since "Dec" is a word
+        """
+        return cursor.is_word
+
+
+class TrieCursor(object):
+    """
+    A place in a trie that moves forward one letter at a time, for when the letters come in one by one (ex. a
+    MaybeNumber being appended to).  Each step is a single hop, rather than a walk from the root every time.
+
+        cursor = trie.cursor()
+        for letter in "Dec":
+            cursor.step(letter)
+        cursor.is_word  # True
+
+    save() gives a token for where the cursor is, and restore() goes back to it.  fork() makes an independent copy.
+    Once a letter isn't in the trie, the cursor is dead (is_prefix is False) until it's reset or restored.
+    """
+    __slots__ = ('_trie', '_node')
+
+    def __init__(self, trie, node=None):
+        self._trie = trie
+        self._node = trie.root if node is None else node
+
+    def step(self, letter):
+        """Moves forward by one letter.  Returns whether the letters so far are still the start of a word."""
+        if self._node is not None:
+            self._node = self._trie._child(self._node, letter.lower())
+        return self._node is not None
 
-    def is_last_lookup_complete(self):
-        """Looks at the value stored in last node and checks to see if it's a complete word"""
-        return '\0' in self._last_node.next
+    @property
+    def is_prefix(self):
+        """The letters so far are the start of a word (or a whole word)"""
+        return self._node is not None
 
+    @property
+    def is_word(self):
+        """The letters so far are a whole word"""
+        return self._node is not None and self._trie._child(self._node, '\0') is not None
+
+    @property
+    def value(self):
+        """The value stored with the word so far, or None"""
+        if self._node is None:
+            return None
+        end = self._trie._child(self._node, '\0')
+        return None if end is None else self._trie._value(end)
+
+    def reset(self):
+        """Back to the root"""
+        self._node = self._trie.root
+
+    def fork(self):
+        # Copies _node as is, since TrieCursor(trie, None) would be a new cursor at the root rather than a dead one
+        copy = TrieCursor(self._trie)
+        copy._node = self._node
+        return copy
+
+    def save(self):
+        return self._node
+
+    def restore(self, state):
+        self._node = state
+
+
+class FrozenTrie(Trie):
+    """
+    A read-only Trie stored in flat arrays instead of a Node object and a dict for every letter.  It's a lot smaller
+    (about 12 bytes per letter instead of a few hundred), so it's the one to use for big word lists.
+
+    That's memory traded for speed: each letter is a str.find over the node's edges instead of a dict lookup, so
+    lookups are slower than in a Trie (how much depends on the word list and how many edges each node has).  If the
+    words fit in memory as a Trie and lookups are the bottleneck, keep the Trie.
+
+    Make one from a filled-in Trie:
+        english = FrozenTrie.from_trie(import_english_trie(Trie()))
+
+    Nodes are just numbers, with the root at 0.  The edges for node i are edges[starts[i]:starts[i + 1]], sorted by
+    letter:
+        labels: one string with the letter for each edge, so finding a child is a str.find over a few letters
+        targets: the node each edge goes to
+    Most nodes don't have a value, so values are only kept for the ones that do:
+        value_nodes: the nodes with a value, in order
+        values: the value for each of those
+    """
+    MAGIC = b'MNTRIE\x00\x01'
+    # magic, number of nodes, number of edges, number of values, length of the encoded labels
+    _HEADER = struct.Struct('<8sIIII')
+
+    def __init__(self, starts, labels, targets, value_nodes, values):
+        super().__init__()
+        self._root = 0
+        self._starts = starts
+        self._labels = labels
+        self._targets = targets
+        self._value_nodes = value_nodes
+        self._values = values
+        self._frozen = True
+        # Whatever the arrays are views into (ex. a mapped file), so it stays open as long as the trie is around
+        self._buffer = None
+        # The shared memory block the trie lives in, if it's in one (see to_shared_memory)
+        self._shared_memory = None
+
+    @classmethod
+    def from_trie(cls, trie):
+        """Compiles a Trie.  Nodes that are shared in the Trie stay shared here."""
+        starts = array.array('I', [0])
+        labels = []
+        targets = array.array('I')
+        value_nodes = array.array('I')
+        values = []
+
+        numbers = {id(trie.root): 0}
+        nodes = [trie.root]
+        # nodes grows as new nodes are found, and each one is numbered in the order it was found
+        for number, node in enumerate(nodes):
+            if node.value is not None:
+                value_nodes.append(number)
+                values.append(node.value)
+            for letter in sorted(node.next):
+                if len(letter) != 1:
+                    raise ValueError(f"Cannot compile {letter!r}: every step in the trie must be a single letter")
+                child = node.next[letter]
+                if id(child) not in numbers:
+                    numbers[id(child)] = len(nodes)
+                    nodes.append(child)
+                labels.append(letter)
+                targets.append(numbers[id(child)])
+            starts.append(len(labels))
+
+        return cls(starts, "".join(labels), targets, value_nodes, values)
+
+    @classmethod
+    def from_sorted(cls, words):
+        """Same as Trie.from_sorted, compiled with from_trie.  Nodes shared in the word graph stay shared."""
+        return cls.from_trie(Trie.from_sorted(words))
+
+    def to_bytes(self):
+        """
+        The trie as bytes, in the format save() writes and from_buffer() reads:
+            header (see _HEADER)
+            starts, targets, value_nodes: unsigned 32-bit little-endian numbers
+            labels: UTF-8, padded with zeros to a multiple of 4 bytes
+            values: JSON, up to the end (or the first zero byte).  Values have to be JSON-friendly, and lists come back as
+                    tuples.
+        """
+        labels = self._labels.encode('utf-8')
+        values = json.dumps(list(self._values)).encode('utf-8')
+        parts = [self._HEADER.pack(self.MAGIC, len(self), len(self._targets), len(self._value_nodes), len(labels))]
+        for numbers in (self._starts, self._targets, self._value_nodes):
+            numbers = array.array('I', numbers)
+            if sys.byteorder == 'big':
+                numbers.byteswap()
+            parts.append(numbers.tobytes())
+        parts += [labels, b'\0' * (-len(labels) % 4), values]
+        return b"".join(parts)
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        """
+        Makes a FrozenTrie from bytes in the to_bytes format.  The arrays are used right where they are in buffer,
+        without copying.  Only the labels and values are decoded.
+        """
+        view = memoryview(buffer)
+        if len(view) < cls._HEADER.size or bytes(view[:len(cls.MAGIC)]) != cls.MAGIC:
+            raise ValueError("Not a saved Trie")
+        magic, nodes, edges, value_count, labels_length = cls._HEADER.unpack_from(view)
+
+        offset = cls._HEADER.size
+        sections = []
+        for count in (nodes + 1, edges, value_count):
+            numbers = view[offset: offset + 4 * count].cast('I')
+            if sys.byteorder == 'big':
+                numbers = array.array('I', numbers)
+                numbers.byteswap()
+            sections.append(numbers)
+            offset += 4 * count
+        starts, targets, value_nodes = sections
+
+        labels = str(view[offset: offset + labels_length], 'utf-8')
+        offset += labels_length + (-labels_length % 4)
+        values = [tuple(value) if isinstance(value, list) else value
+                  for value in json.loads(str(view[offset:], 'utf-8').rstrip('\0'))]
+
+        trie = cls(starts, labels, targets, value_nodes, values)
+        trie._buffer = buffer
+        return trie
+
+    def to_shared_memory(self, name=None):
+        """
+        Copies the trie into a new shared memory block and returns a FrozenTrie that uses it.  Other processes can use
+        the same block with FrozenTrie.attach(name), and pickling the returned trie (ex. sending it to a
+        ProcessPoolExecutor worker) only sends the name.  So however many workers there are, there's only one copy of
+        the arrays.  The label string and the values are still decoded in each process.
+
+        When every process is done with it, call unlink() from this process to free the block.
+        """
+        data = self.to_bytes()
+        # The block starts with which resource tracker this process uses (see _attach_shared_memory), then the trie
+        block = shared_memory.SharedMemory(name=name, create=True, size=_TRACKER_ID.size + len(data))
+        _TRACKER_ID.pack_into(block.buf, 0, *_resource_tracker_id())
+        block.buf[_TRACKER_ID.size: _TRACKER_ID.size + len(data)] = data
+        trie = self.from_buffer(block.buf[_TRACKER_ID.size:])
+        trie._shared_memory = block
+        return trie
+
+    @classmethod
+    def attach(cls, name):
+        """Uses a trie another process put in shared memory with to_shared_memory, without copying it"""
+        block = _attach_shared_memory(name)
+        trie = cls.from_buffer(block.buf[_TRACKER_ID.size:])
+        trie._shared_memory = block
+        return trie
+
+    @property
+    def shared_memory_name(self):
+        """The name of the shared memory block the trie is in, or None"""
+        return None if self._shared_memory is None else self._shared_memory.name
+
+    def __reduce__(self):
+        if self._shared_memory is not None:
+            return type(self).attach, (self._shared_memory.name,)
+        return type(self).from_buffer, (self.to_bytes(),)
+
+    def close(self):
+        """Lets go of the shared memory or mapped file the trie is in.  The trie can't be used after this."""
+        for numbers in (self._starts, self._targets, self._value_nodes):
+            if isinstance(numbers, memoryview):
+                numbers.release()
+        if self._shared_memory is not None:
+            self._buffer.release()
+            self._shared_memory.close()
+        elif isinstance(self._buffer, memory_map.mmap):
+            self._buffer.close()
+
+    def unlink(self):
+        """Frees the shared memory block for good.  Only the process that called to_shared_memory should do this."""
+        if self._shared_memory is None:
+            raise ValueError("This trie isn't in shared memory")
+        self._shared_memory.unlink()
+
+    def __len__(self):
+        """Number of nodes"""
+        return len(self._starts) - 1
+
+    def _child(self, node, letter):
+        if len(letter) != 1:
+            return None
+        i = self._labels.find(letter, self._starts[node], self._starts[node + 1])
+        return None if i == -1 else self._targets[i]
+
+    # _walk and get are where lookups spend their time, so they have _child written out in them, with everything it
+    # needs held in locals.  Otherwise, every letter costs a method call on top of the find.
+
+    def _walk(self, a_string):
+        # Lowercasing the whole string at once only gives the same letters as lowercasing each one for ASCII
+        if not a_string.isascii():
+            return super()._walk(a_string)
+        find, starts, targets = self._labels.find, self._starts, self._targets
+        nodes = []
+        append = nodes.append
+        node = 0
+        for letter in a_string.lower():
+            i = find(letter, starts[node], starts[node + 1])
+            if i == -1:
+                break
+            node = targets[i]
+            append(node)
+        return nodes
+
+    def get(self, word, default=None):
+        find, starts, targets = self._labels.find, self._starts, self._targets
+        node = 0
+        for letter in word.lower() + '\0':
+            i = find(letter, starts[node], starts[node + 1])
+            if i == -1:
+                return default
+            node = targets[i]
+        value = self._value(node)
+        return default if value is None else value
+
+    def _children(self, node):
+        lo, hi = self._starts[node], self._starts[node + 1]
+        return list(zip(self._labels[lo:hi], self._targets[lo:hi]))
+
+    def _value(self, node):
+        i = bisect.bisect_left(self._value_nodes, node)
+        if i < len(self._value_nodes) and self._value_nodes[i] == node:
+            return self._values[i]
+        return None
+
+    def freeze(self):
+        return self
+
+
+# Which resource tracker made a shared memory block: the device and inode of the pipe to it (see _resource_tracker_id)
+_TRACKER_ID = struct.Struct('<QQ')
+
+
+def _resource_tracker_id():
+    """
+    Identifies the resource tracker this process reports to.  Processes started by multiprocessing (forked or spawned)
+    inherit their parent's pipe to the tracker, and the same pipe has the same inode in every process.
+    """
+    if os.name != 'posix':
+        return 0, 0
+    pipe = os.fstat(resource_tracker.getfd())
+    return pipe.st_dev, pipe.st_ino
+
+
+def _attach_shared_memory(name):
+    """
+    Opens an existing shared memory block without leaving it with a resource tracker of its own.  Otherwise, on POSIX
+    that tracker unlinks the block when the attaching process exits, pulling it out from under everybody else.
+    The process that made the block keeps it registered, so the block is still cleaned up if that process dies.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 there's no track argument, so opening the block registers it.  If this process shares the
+        # tracker of the one that made the block (ex. a ProcessPoolExecutor worker), registering again does nothing and
+        # unregistering would drop the maker's registration.  Only a process with its own tracker takes it back out.
+        block = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix' and bytes(block.buf[:_TRACKER_ID.size]) != _TRACKER_ID.pack(*_resource_tracker_id()):
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block